@@ -0,0 +1,54 @@
+# Compare the snapshot parsers on a sample of the dataset
+# - 'safe'   : the original yaml.safe_load
+# - 'c'      : yaml with the libyaml bindings
+# - 'stream' : the libyaml event stream, keeping only the link fields
+#
+# Usage: python benchmark_parsers.py [number_of_files]
+
+import random
+import sys
+import time
+
+import helpers.helpers as helper
+import helpers.ingest as ingest
+from helpers.snapshot_parser import parsers, link_fields
+
+# Sample of the dataset
+sample_size = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+files = ingest.list_snapshots(helper.dataset_path)
+random.seed(0)
+files = random.sample(files, min(sample_size, len(files)))
+
+def _links(data):
+    # .. keep only what the analysis uses, for comparison
+    if data is None:
+        return None
+    return {src: [{k: link.get(k) for k in link_fields} for link in data[src]['links']]
+            for src in data}
+
+# Time each parser
+print("Parsing {} snapshots...".format(len(files)))
+reference = None
+timings = {}
+for name in parsers:
+    outputs = []
+    start = time.perf_counter()
+    for file in files:
+        outputs.append(ingest.load_snapshot(file, parser=name))
+    timings[name] = time.perf_counter() - start
+
+    # .. check that all parsers agree
+    # -> compared by repr, so that NaN loads compare equal
+    outputs = [repr(_links(data)) for data in outputs]
+    if reference is None:
+        reference = outputs
+    elif outputs != reference:
+        print("WARNING: parser '{}' output differs from 'safe'".format(name))
+
+# Report
+for name in timings:
+    print("{:8}{:8.3f} s  {:6.1f} ms/file  x{:.1f}".format(
+        name,
+        timings[name],
+        1000*timings[name]/len(files),
+        timings['safe']/timings[name]))
@@ -0,0 +1,23 @@
+# Produces
+# - load_matrix.npy
+# - load_matrix.json
+#
+# Requires link_metadata.csv (see parse_per_link_data.py or parse_snapshots.py)
+
+import helpers.helpers as helper
+import helpers.ingest as ingest
+from helpers.load_matrix import LoadMatrixBuilder
+
+# Setting the date range we use
+start_date = helper.analysis_start
+end_date   = helper.analysis_end
+
+# Command-line options
+args = ingest.arg_parser().parse_args()
+
+# Start parsing
+print("Building the load matrix...")
+ingest.run([LoadMatrixBuilder(start_date=start_date, end_date=end_date)],
+           workers=args.workers, batch_size=args.batch,
+           downloads=ingest.downloads(args))
+print("... done.")
@@ -0,0 +1,101 @@
+# Check the downloader (helpers/dataverse.py) against a local stand-in of
+# the Dataverse API (see helpers/dataverse_standin.py)
+# - complete downloads, verified against their checksum
+# - downloads cut by the server are resumed with Range requests
+# - a partial file left by an interrupted run is resumed
+# - a file with a wrong checksum is rejected, and not kept
+# - files verified by a previous run are not downloaded or hashed again
+# - closing the downloads early does not wait for the remaining files
+#
+# Usage: python check_download.py
+
+from pathlib import Path
+import random
+import tempfile
+from unittest import mock
+
+import helpers.dataverse as dataverse
+from helpers.dataverse_standin import StandIn
+
+def download_all(server, download_path):
+    files = dataverse.list_files(server.url, 'doi:stand-in')
+    return {path.name for file_info, path in dataverse.iter_downloads(
+        download_path, files, server.url, workers=2, chunk_size=1 << 12)}
+
+def same_files(source, download_path):
+    return all((download_path / path.name).read_bytes() == path.read_bytes()
+               for path in source.iterdir())
+
+with tempfile.TemporaryDirectory() as tmp:
+    tmp = Path(tmp)
+    # .. a few files of random content, of various sizes
+    source = tmp / 'source'
+    source.mkdir()
+    random.seed(0)
+    for i, size in enumerate([0, 1, 1000, 100_000, 1_000_000]):
+        (source / 'file_{}.bin'.format(i)).write_bytes(random.randbytes(size))
+    names = {path.name for path in source.iterdir()}
+
+    print("Complete downloads...")
+    server = StandIn(source).start()
+    assert download_all(server, tmp / 'plain') == names
+    assert same_files(source, tmp / 'plain')
+    server.shutdown()
+
+    print("Downloads cut by the server...")
+    server = StandIn(source, mode='flaky').start()
+    assert download_all(server, tmp / 'flaky') == names
+    assert same_files(source, tmp / 'flaky')
+    assert server.requests['file_4.bin'] == 2
+    server.shutdown()
+
+    print("Partial file of an interrupted run...")
+    server = StandIn(source).start()
+    download_path = tmp / 'partial'
+    download_path.mkdir()
+    content = (source / 'file_4.bin').read_bytes()
+    (download_path / 'file_4.bin.part').write_bytes(content[:300_000])
+    assert download_all(server, download_path) == names
+    assert same_files(source, download_path)
+    assert not (download_path / 'file_4.bin.part').exists()
+
+    print("Files verified by a previous run...")
+    requests_before = dict(server.requests)
+    with mock.patch.object(dataverse, '_hash_file') as hash_file:
+        assert download_all(server, download_path) == names
+    assert server.requests == requests_before
+    assert not hash_file.called
+    # .. a file changed since it was verified is hashed, and downloaded again
+    (download_path / 'file_3.bin').write_bytes(b'changed')
+    assert download_all(server, download_path) == names
+    assert same_files(source, download_path)
+    server.shutdown()
+
+    print("Wrong checksum...")
+    server = StandIn(source, mode='badsum').start()
+    try:
+        download_all(server, tmp / 'badsum')
+    except RuntimeError as exc:
+        assert 'file_0.bin' in str(exc)
+    else:
+        raise AssertionError('the wrong checksum was not detected')
+    assert not (tmp / 'badsum' / 'file_0.bin').exists()
+    server.shutdown()
+
+    print("Downloads closed early...")
+    many = tmp / 'many'
+    many.mkdir()
+    for i in range(20):
+        (many / 'file_{:02}.bin'.format(i)).write_bytes(random.randbytes(1_000_000))
+    server = StandIn(many).start()
+    files = dataverse.list_files(server.url, 'doi:stand-in')
+    downloads = dataverse.iter_downloads(tmp / 'closed', files, server.url,
+                                         workers=2, chunk_size=1 << 12)
+    next(downloads)
+    downloads.close()
+    # .. the queued files are not requested
+    assert len(server.requests) < len(files)
+    server.shutdown()
+    server.server_close()
+
+print("... done.")
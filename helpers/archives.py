@@ -0,0 +1,85 @@
+# Reading the snapshots from the compressed dataset
+#
+# The dataset is distributed as compressed files; rather than extracting
+# them, the snapshots are read directly from
+# - archives (.tar, .tar.gz, .tgz, .tar.xz, .tar.bz2, .zip) holding many
+#   snapshots, streamed member by member (see helpers.ingest.run, which
+#   reads up to one archive per worker at once, each in its own thread, and
+#   has the workers parse the members in batches; the decompression
+#   libraries release the GIL, so the archives decompress in parallel)
+# - single compressed snapshots (.yaml.gz, .yaml.xz, .yaml.bz2), read like
+#   the plain snapshot files
+
+import bz2
+import gzip
+import io
+import lzma
+import tarfile
+import zipfile
+
+# Compression of single snapshot files
+compressed_suffixes = {
+    '.gz': gzip.open,
+    '.xz': lzma.open,
+    '.bz2': bz2.open,
+}
+
+# .. and of their content, already read in memory
+decompressors = {
+    '.gz': gzip.decompress,
+    '.xz': lzma.decompress,
+    '.bz2': bz2.decompress,
+}
+
+# Suffixes of archives holding several snapshots
+tar_suffixes = ('.tar', '.tar.gz', '.tgz', '.tar.xz', '.txz', '.tar.bz2', '.tbz2')
+zip_suffixes = ('.zip',)
+archive_suffixes = tar_suffixes + zip_suffixes
+
+def is_archive(file):
+    """Whether a file is an archive holding several snapshots."""
+    return file.name.endswith(archive_suffixes)
+
+def uncompressed_name(name):
+    """File name without the compression suffix, e.g., for
+    europe_yaml_1591000200.yaml.gz -> europe_yaml_1591000200.yaml
+    """
+    # .. plain string operations: this runs for every file of the dataset
+    base, dot, suffix = name.rpartition('.')
+    if base and dot + suffix in compressed_suffixes:
+        return base
+    return name
+
+def open_snapshot(file):
+    """Open a (possibly compressed) snapshot file as text."""
+    opener = compressed_suffixes.get(file.suffix)
+    if opener is None:
+        return open(file, 'r')
+    return opener(file, 'rt')
+
+def decode_snapshot(file, content):
+    """Text stream of a (possibly compressed) snapshot file, from its bytes."""
+    decompress = decompressors.get(file.suffix)
+    if decompress is not None:
+        content = decompress(content)
+    return io.StringIO(content.decode('utf-8'))
+
+def iter_members(archive):
+    """Iterate over the files of an archive, in archive order, without
+    extracting it. Yields (member name, content bytes), to be read with
+    `decode_snapshot`.
+    """
+    # .. snapshots are small: each member is decompressed in memory
+    if archive.name.endswith(zip_suffixes):
+        with zipfile.ZipFile(archive) as f:
+            for info in f.infolist():
+                if info.is_dir():
+                    continue
+                yield info.filename, f.read(info)
+    else:
+        # .. streaming mode: the archive is decompressed once, sequentially
+        with tarfile.open(archive, 'r|*') as f:
+            for info in f:
+                if not info.isfile():
+                    continue
+                yield info.name, f.extractfile(info).read()
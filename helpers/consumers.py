@@ -0,0 +1,261 @@
+# Snapshot consumers
+#
+# Each consumer extracts one type of output from the parsed snapshots.
+# They are fed by helpers.ingest.run(), which parses each snapshot only once.
+
+import csv
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from helpers.ingest import Consumer
+from helpers.interning import LinkTable, mirror_max, pair_max
+from helpers.manifest import Manifest, manifest_path
+from helpers.spill import SpillingSet
+import helpers.helpers as helper
+import helpers.link_store as link_store
+
+# ========================================
+class LinkMetadata(Consumer):
+    """Collect the metadata of all links seen in the dataset.
+    Produces
+    - link_metadata.csv
+    - link_duplicate.csv
+    """
+
+    header = ['link', 'capacity', 'internal']
+    capacity = int(100) # 100 Gbps for all links
+
+    def __init__(self, metadata_file='link_metadata.csv',
+                 duplicate_file='link_duplicate.csv', max_links=1_000_000):
+        self.metadata_file = metadata_file
+        self.duplicate_file = duplicate_file
+        # .. at most `max_links` link IDs are kept in memory, the rest is
+        #    spilled to disk (see helpers/spill.py)
+        self.metadata = SpillingSet(max_links)
+        self.duplicate_link_IDs = SpillingSet(max_links) # links that have duplicated IDs in the dataset
+
+    def process(self, timestamp, data):
+        # The dataset contains duplicate labels for different links
+        # This is most likely a bug from the data collection process
+        # - Creating a unique label for each link does not work,
+        #   because it makes it impossible to connect links to
+        #   one another across files.
+        # - Instead, we aggregate duplicate links and sum their load
+        #   - This will be pessimistic wrt potential energy savings by turning
+        #   links off.
+        #   - It may also lead to links with more than 100% util.
+        # Note: we log the number of links with duplicate IDs,
+        # so we can get an idea of how big of an approximation this entails.
+        ###
+        links = set()
+        duplicates = set()
+        for src in data:
+            for link in data[src]['links']:
+                dst = link['peer']
+                label = link['label']
+                internal = (src[0].islower() and dst[0].islower())
+
+                # build the link ID
+                link_ID = "{}_{}_{}".format(src,dst,label)
+
+                # the same ID twice in one snapshot is a duplicated link
+                if (link_ID, internal) in links:
+                    duplicates.add(link_ID)
+                links.add((link_ID, internal))
+
+        return links, duplicates
+
+    def collect(self, timestamp, result):
+        links, duplicates = result
+        self.metadata.update({(link_ID, str(internal)) for link_ID, internal in links})
+        self.duplicate_link_IDs.update({(link_ID,) for link_ID in duplicates})
+
+    def finalize(self):
+        # .. stream the sorted, unique link IDs to the output files
+        #    (with '\n' line endings, as pandas.to_csv)
+        print("... saving final metadata")
+        with open(self.metadata_file, 'w', newline='') as f:
+            writer = csv.writer(f, lineterminator='\n')
+            writer.writerow(self.header)
+            for link_ID, internal in self.metadata:
+                writer.writerow([link_ID, self.capacity, internal])
+        self.metadata.close()
+
+        with open(self.duplicate_file, 'w', newline='') as f:
+            writer = csv.writer(f, lineterminator='\n')
+            writer.writerow([0])
+            writer.writerows(self.duplicate_link_IDs)
+        self.duplicate_link_IDs.close()
+# ========================================
+class PerLinkData(Consumer):
+    """Collect the load of each link over time.
+    Produces
+    - per-link-data.parquet (see helpers/link_store.py)
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.writer = None
+
+    def process(self, timestamp, data):
+        # dict = {key = src_dst_label, value = load}
+        # -> duplicate link IDs are aggregated by summing their load
+        link_loads = {}
+        for src in data:
+            for link in data[src]['links']:
+                link_ID = "{}_{}_{}".format(src,link['peer'],link['label'])
+                link_loads[link_ID] = link_loads.get(link_ID, 0) + link['load']
+        return link_loads
+
+    def collect(self, timestamp, result):
+        # .. the store is only (re)created once there is data to write
+        if self.writer is None:
+            self.writer = link_store.StoreWriter(self.path)
+        self.writer.append(timestamp, result)
+
+    def finalize(self):
+        if self.writer is not None:
+            self.writer.flush()
+# ========================================
+class RowConsumer(Consumer):
+    """Base class for the consumers producing one output row per snapshot.
+    Supports incremental runs: new rows are appended to the existing output
+    and the rows of changed snapshots are replaced.
+    """
+
+    header_full = []
+
+    def __init__(self, file_name):
+        self.file_name = Path(file_name)
+        self.stats = []
+        self.incremental = False
+
+    def open_manifest(self, incremental):
+        # .. a full run starts a new manifest
+        # -> so does an output without manifest (e.g., from an older run):
+        #    there is no telling which snapshots it holds
+        manifest_file = manifest_path(self.file_name)
+        self.incremental = (incremental and self.file_name.exists()
+                            and manifest_file.exists())
+        self.manifest = Manifest(manifest_file, load=self.incremental)
+
+    def collect(self, timestamp, result):
+        self.stats.append(result)
+
+    def finalize(self):
+        new = pd.DataFrame(self.stats, columns=self.header_full)
+        # .. the snapshots of archives are collected archive by archive
+        if not new['timestamp'].is_monotonic_increasing:
+            new = new.sort_values(by='timestamp', ignore_index=True)
+        if not self.incremental:
+            new.to_csv(self.file_name, index=False, mode='w')
+            out = new
+        else:
+            out = self._merge(new)
+        if self.manifest is not None:
+            self.manifest.save(out['timestamp'])
+
+    def _merge(self, new):
+        """Merge the `new` rows into the existing output."""
+        # .. untouched rows are written back as they were read
+        existing = pd.read_csv(self.file_name, float_precision='round_trip')
+        stale_rows = self.manifest.stale_rows()
+        if (not stale_rows and
+                (existing.empty or new.empty or
+                 new['timestamp'].min() > existing['timestamp'].max())):
+            # .. only new snapshots, in order: append
+            new.to_csv(self.file_name, index=False, header=False, mode='a')
+            out = pd.concat([existing, new])
+        else:
+            # .. replace the rows of changed snapshots and re-sort
+            out = pd.concat([existing.drop(index=stale_rows), new])
+            out = out.sort_values(by='timestamp')
+            out.to_csv(self.file_name, index=False, mode='w')
+        return out
+# ========================================
+class LinkSleeping(RowConsumer):
+    """Count the links required between each pair of hosts.
+    Produces
+    - link_sleeping.csv
+    """
+
+    header = ['#links', 'sum_util', 'req_link_1way', 'req_link_2ways']
+    header_full = ['#links', 'sum_util', 'req_link_1way', 'req_link_2ways', 'timestamp']
+
+    def __init__(self, file_name='link_sleeping.csv'):
+        super().__init__(file_name)
+        # .. host pairs (src, dst), interned across snapshots
+        self.pairs = LinkTable(with_label=False)
+
+    def process(self, timestamp, data):
+        # extract the data for each host pair
+        # -> #links and sum_load per pair, as integer-indexed arrays
+        pairs, loads = self.pairs.intern_snapshot(data)
+        num_links, sum_util = self.pairs.aggregate(pairs, loads)
+
+        # Count the number of links required
+        req_links = np.ceil(sum_util/100).astype(np.int64)
+
+        # Get the max of the two directions
+        # -> one-directional host pairs keep their own count
+        present, req_links_2ways = mirror_max(req_links, num_links, self.pairs.mirror())
+
+        # Compute the sum of links required
+        # -> sum of all the last keys gives the number of required end points up
+        #    that is, twice the number of links
+        return [
+            num_links[present].sum(),
+            sum_util[present].sum(),
+            req_links[present].sum(),
+            req_links_2ways.sum(),
+            timestamp,
+        ]
+# ========================================
+class RateAdaptation(RowConsumer):
+    """Count the links that could be down-rated to 10G or 25G.
+    Produces
+    - rate_adaptation_<start_date>_<end_date>.csv
+    """
+
+    header_full = (['timestamp'] +
+                   ['{}_count'.format(rate) for rate in helper.rate_ladder] +
+                   ['total_count'])
+
+    def __init__(self, start_date=helper.analysis_start, end_date=helper.analysis_end):
+        super().__init__('rate_adaptation_' + start_date + '_' + end_date + '.csv')
+        self.start_ts = helper.ymd_to_timestamp(start_date)
+        self.end_ts = helper.ymd_to_timestamp(end_date)
+        # .. links (src, dst, label), interned across snapshots
+        self.links = LinkTable()
+
+    def accept(self, timestamp):
+        # bound analysis to the desired date range
+        return self.start_ts <= timestamp <= self.end_ts
+
+    def bounds(self):
+        return self.start_ts, self.end_ts
+
+    def process(self, timestamp, data):
+        return self.process_batch([(timestamp, data)])[0]
+
+    def process_batch(self, snapshots):
+        # extract the data for each link of all snapshots at once
+        # -> flat (snapshot, link, load) arrays
+        # -> duplicated link labels are aggregated by summing their load
+        groups, links, loads = self.links.intern_batch(snapshots)
+        groups, links, util_1way = self.links.aggregate_batch(groups, links, loads)
+
+        # Get the max of the two directions, within each snapshot
+        util_2ways = pair_max(groups, links, util_1way, self.links.mirror())
+
+        # Count the links per (snapshot, required capacity)
+        ladder = np.asarray(helper.rate_ladder)
+        order = np.argsort(ladder)
+        rate_column = order[np.searchsorted(ladder[order], helper.capacity_bounds(util_2ways))]
+        counts = np.bincount(groups*len(ladder) + rate_column,
+                             minlength=len(snapshots)*len(ladder)).reshape(-1, len(ladder))
+        total_counts = np.bincount(groups, minlength=len(snapshots))
+        return [[timestamp] + counts[group].tolist() + [int(total_counts[group])]
+                for group, (timestamp, data) in enumerate(snapshots)]
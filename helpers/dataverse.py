@@ -0,0 +1,229 @@
+# Downloading the OVH dataset from Dataverse
+#
+# Uses the Dataverse native API directly:
+# - the file list (names, ids, sizes and checksums) comes from the metadata
+#   of the latest version of the dataset
+# - each file is streamed to disk in chunks, as `<name>.part` until complete
+#   and verified, so that an interrupted download resumes where it stopped
+#   (with an HTTP Range request) instead of starting over
+# - files are downloaded by a bounded pool of threads
+# - the verified files are recorded (checksum, size and modification time)
+#   in `.verified.json`, so that later runs only hash the files that changed
+#
+# The base URL is a parameter, so any server implementing these two API
+# endpoints (e.g., a local stand-in) can be used.
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import hashlib
+import json
+import threading
+
+import requests
+
+base_url = 'https://dataverse.uclouvain.be'
+DOI = 'doi:10.14428/DVN/0LNXDQ'
+
+# Hash functions of the Dataverse checksum types
+checksum_types = {
+    'MD5': 'md5',
+    'SHA-1': 'sha1',
+    'SHA-256': 'sha256',
+    'SHA-512': 'sha512',
+}
+
+class ChecksumError(Exception):
+    pass
+
+class Cancelled(Exception):
+    pass
+
+def list_files(base_url=base_url, doi=DOI, session=None):
+    """Files of the latest version of the dataset, as a list of dicts with
+    the file `id`, `filename`, `size`, `checksum_type` and `checksum`.
+    """
+    if session is None:
+        session = requests.Session()
+    response = session.get(base_url.rstrip('/') + '/api/datasets/:persistentId/',
+                           params={'persistentId': doi}, timeout=60)
+    response.raise_for_status()
+
+    files = []
+    for entry in response.json()['data']['latestVersion']['files']:
+        data_file = entry['dataFile']
+        checksum = data_file.get('checksum', {})
+        files.append({
+            'id': data_file['id'],
+            'filename': data_file['filename'],
+            'size': data_file.get('filesize'),
+            'checksum_type': checksum.get('type', 'MD5' if 'md5' in data_file else None),
+            'checksum': checksum.get('value', data_file.get('md5')),
+        })
+    return files
+
+def _new_hash(file_info):
+    """Hash object for the checksum of a file (None if not supported)."""
+    name = checksum_types.get(file_info['checksum_type'])
+    if name is None or file_info['checksum'] is None:
+        return None
+    return hashlib.new(name)
+
+def _hash_file(h, path, chunk_size):
+    """Update the hash `h` with the content of an existing file."""
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+
+def verified_path(download_path):
+    """Record of the files verified in `download_path`."""
+    return download_path / '.verified.json'
+
+def load_verified(download_path):
+    """Files verified by previous runs, as {name: [checksum, size, mtime]}."""
+    path = verified_path(download_path)
+    if not path.exists():
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def save_verified(download_path, verified):
+    path = verified_path(download_path)
+    tmp = path.with_name(path.name + '.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(verified, f)
+    tmp.replace(path)
+
+def _mark_verified(file_info, path, verified):
+    if verified is not None:
+        stat = path.stat()
+        verified[path.name] = [file_info['checksum'], stat.st_size, stat.st_mtime_ns]
+
+def is_complete(file_info, path, chunk_size=1 << 20, verified=None):
+    """Whether `path` already holds the (verified) file.
+    Files recorded in `verified` (see `load_verified`) and unchanged since
+    are not hashed again; newly verified files are added to it.
+    """
+    if not path.exists():
+        return False
+    stat = path.stat()
+    if file_info['size'] is not None and stat.st_size != file_info['size']:
+        return False
+    h = _new_hash(file_info)
+    if h is None:
+        return True
+    if verified is not None and verified.get(path.name) == [
+            file_info['checksum'], stat.st_size, stat.st_mtime_ns]:
+        return True
+    _hash_file(h, path, chunk_size)
+    if h.hexdigest() != file_info['checksum']:
+        return False
+    _mark_verified(file_info, path, verified)
+    return True
+
+def download_file(file_info, download_path, base_url=base_url, session=None,
+                  chunk_size=1 << 20, retries=3, verified=None, stop=None):
+    """Download one file of the dataset to `download_path`, resuming a
+    partial download if any. The file is verified against its checksum,
+    and recorded in `verified` (see `is_complete`).
+    Setting the `stop` event cancels the download (keeping the partial file).
+    Returns the path of the downloaded file.
+    """
+    if session is None:
+        session = requests.Session()
+    path = download_path / file_info['filename']
+    part = path.with_name(path.name + '.part')
+    url = '{}/api/access/datafile/{}'.format(base_url.rstrip('/'), file_info['id'])
+    if is_complete(file_info, path, chunk_size, verified):
+        return path
+
+    for attempt in range(retries + 1):
+        if stop is not None and stop.is_set():
+            raise Cancelled(path.name)
+        try:
+            # Resume the partial download, if any
+            # -> the server may ignore the range and send the whole file
+            offset = part.stat().st_size if part.exists() else 0
+            headers = {'Range': 'bytes={}-'.format(offset)} if offset else {}
+            h = _new_hash(file_info)
+            with session.get(url, headers=headers, stream=True, timeout=60) as response:
+                if response.status_code == 416:
+                    # .. the partial file is already complete, or invalid
+                    if offset != file_info['size']:
+                        part.unlink()
+                        raise requests.HTTPError('invalid partial file {}'.format(part.name))
+                    chunks = []
+                elif response.status_code == 206:
+                    chunks = response.iter_content(chunk_size)
+                else:
+                    response.raise_for_status()
+                    offset = 0
+                    chunks = response.iter_content(chunk_size)
+                if h is not None and offset:
+                    _hash_file(h, part, chunk_size)
+                with open(part, 'ab' if offset else 'wb') as f:
+                    for chunk in chunks:
+                        if stop is not None and stop.is_set():
+                            raise Cancelled(path.name)
+                        f.write(chunk)
+                        if h is not None:
+                            h.update(chunk)
+
+            # Verify the complete file
+            if file_info['size'] is not None and part.stat().st_size != file_info['size']:
+                raise requests.ConnectionError('incomplete download of {}'.format(path.name))
+            if h is not None and h.hexdigest() != file_info['checksum']:
+                # .. the partial file is corrupted: start over
+                part.unlink()
+                raise ChecksumError('checksum mismatch for {}'.format(path.name))
+            part.replace(path)
+            if h is not None:
+                _mark_verified(file_info, path, verified)
+            return path
+
+        except (requests.RequestException, ChecksumError) as exc:
+            if attempt == retries or (stop is not None and stop.is_set()):
+                raise
+            print('Retrying {} ({})'.format(path.name, exc))
+
+def iter_downloads(download_path, files=None, base_url=base_url, doi=DOI, workers=4,
+                   **kwargs):
+    """Download the `files` of the dataset (default: all) with `workers`
+    threads. Yields (file info, path) as each file completes, in completion
+    order; files that fail are reported at the end with an exception.
+    Closing the generator (or an exception in the caller) cancels the
+    remaining downloads without waiting for them.
+    """
+    download_path.mkdir(parents=True, exist_ok=True)
+    # .. one session per thread (sessions are not thread-safe)
+    local = threading.local()
+    verified = load_verified(download_path)
+    stop = threading.Event()
+    def download(file_info):
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+        return download_file(file_info, download_path, base_url, local.session,
+                             verified=verified, stop=stop, **kwargs)
+
+    if files is None:
+        files = list_files(base_url, doi)
+    failed = []
+    pool = ThreadPoolExecutor(workers)
+    try:
+        futures = {pool.submit(download, file_info): file_info for file_info in files}
+        for future in as_completed(futures):
+            file_info = futures[future]
+            try:
+                path = future.result()
+            except (requests.RequestException, ChecksumError, OSError) as exc:
+                print('Failed to download {}: {}'.format(file_info['filename'], exc))
+                failed.append(file_info['filename'])
+                continue
+            yield file_info, path
+    finally:
+        # .. drop the queued downloads, and stop the running ones
+        stop.set()
+        pool.shutdown(wait=False, cancel_futures=True)
+        # .. also keep what was verified by an interrupted run
+        save_verified(download_path, dict(verified))
+    if failed:
+        raise RuntimeError('{} file(s) failed to download: {}'.format(
+            len(failed), ', '.join(failed)))
@@ -0,0 +1,106 @@
+# Local stand-in for the Dataverse API used by helpers/dataverse.py
+#
+# Serves the files of a local folder as the latest version of a dataset:
+# - /api/datasets/:persistentId/   the file list, with sizes and MD5 checksums
+# - /api/access/datafile/<id>      the file content, with Range requests
+# Failures can be injected to test the downloader:
+# - 'flaky'  : the first response for each file is cut in the middle
+# - 'badsum' : the checksum of the first file is wrong
+#
+# Used by check_download.py; to serve a folder on its own:
+#   python helpers/dataverse_standin.py <folder> [--port 8000] [--mode flaky]
+
+import argparse
+import hashlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+from pathlib import Path
+import re
+import threading
+
+first_id = 100
+
+class StandIn(ThreadingHTTPServer):
+    """Dataverse stand-in serving the files of `root` on localhost."""
+
+    daemon_threads = True
+
+    def __init__(self, root, port=0, mode=None):
+        super().__init__(('127.0.0.1', port), _Handler)
+        self.mode = mode
+        self.files = sorted(path for path in Path(root).iterdir() if path.is_file())
+        self.metadata = [{'dataFile': {
+            'id': first_id + i,
+            'filename': path.name,
+            'filesize': path.stat().st_size,
+            'checksum': {'type': 'MD5', 'value': hashlib.md5(path.read_bytes()).hexdigest()},
+        }} for i, path in enumerate(self.files)]
+        if mode == 'badsum' and self.metadata:
+            self.metadata[0]['dataFile']['checksum']['value'] = '0'*32
+        # .. {file name: number of content requests}
+        self.requests = {}
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{}'.format(self.server_address[1])
+
+    def start(self):
+        """Serve in a background thread; returns the server."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+class _Handler(BaseHTTPRequestHandler):
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body=b''):
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        server = self.server
+        if self.path.startswith('/api/datasets/:persistentId/'):
+            body = {'data': {'latestVersion': {'files': server.metadata}}}
+            return self._send(200, json.dumps(body).encode())
+
+        match = re.fullmatch(r'/api/access/datafile/(\d+)', self.path)
+        index = int(match.group(1)) - first_id if match else -1
+        if not 0 <= index < len(server.files):
+            return self._send(404)
+        path = server.files[index]
+        data = path.read_bytes()
+        server.requests[path.name] = server.requests.get(path.name, 0) + 1
+
+        # .. resume from the requested offset
+        status, offset = 200, 0
+        match = re.fullmatch(r'bytes=(\d+)-', self.headers.get('Range', ''))
+        if match:
+            offset = int(match.group(1))
+            if offset >= len(data):
+                return self._send(416)
+            status = 206
+        data = data[offset:]
+
+        if server.mode == 'flaky' and server.requests[path.name] == 1:
+            # .. announce the whole content, but drop the connection halfway
+            self.send_response(status)
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data[:len(data)//2])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self._send(status, data)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('root', type=Path, help='folder of the files to serve')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--mode', choices=['flaky', 'badsum'])
+    args = parser.parse_args()
+    server = StandIn(args.root, args.port, args.mode)
+    print("Serving {} files on {}".format(len(server.files), server.url))
+    server.serve_forever()
@@ -1,25 +1,33 @@
 #!/bin/python3
 # Romain Jacob
+#
+# Downloads the OVH dataset from Dataverse (see helpers/dataverse.py).
+# Interrupted downloads can be resumed by running the script again.
 
+import argparse
 from pathlib import Path
-from pyDataverse.api import NativeApi, DataAccessApi
-from pyDataverse.models import Dataverse
+import sys
 
-base_url = 'https://dataverse.uclouvain.be/'
-DOI = "doi:10.14428/DVN/0LNXDQ"
-download_path = Path('dataset')
+# .. import the helpers package from the repository root, rather than
+#    helpers/helpers.py from the script folder
+sys.path[0] = str(Path(__file__).resolve().parent.parent)
+import helpers.dataverse as dataverse
 
-api = NativeApi(base_url)
-data_api = DataAccessApi(base_url)
-dataset = api.get_dataset(DOI)
+parser = argparse.ArgumentParser()
+parser.add_argument('--base-url', default=dataverse.base_url,
+                    help='Dataverse server')
+parser.add_argument('--doi', default=dataverse.DOI,
+                    help='persistent ID of the dataset')
+parser.add_argument('--path', type=Path, default=Path('dataset'),
+                    help='download folder')
+parser.add_argument('--workers', type=int, default=4,
+                    help='number of files downloaded in parallel')
+args = parser.parse_args()
 
-files_list = dataset.json()['data']['latestVersion']['files']
+files_list = dataverse.list_files(args.base_url, args.doi)
+print("{} files to download".format(len(files_list)))
 
-for file in files_list:
-    filename = file["dataFile"]["filename"]
-    file_id = file["dataFile"]["id"]
-    print("File name {}, id {}".format(filename, file_id))
-
-    response = data_api.get_datafile(file_id)
-    with open(download_path/filename, "wb") as f:
-        f.write(response.content)
+for count, (file, path) in enumerate(dataverse.iter_downloads(
+        args.path, files_list, args.base_url, workers=args.workers), start=1):
+    print("File name {}, id {} ({} out of {})".format(
+        file['filename'], file['id'], count, len(files_list)))
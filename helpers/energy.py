@@ -0,0 +1,176 @@
+# Network-wide energy simulator
+#
+# Replays the per-link loads of the load matrix (see helpers/load_matrix.py)
+# through the port power model, for each adaptation strategy (see
+# helpers/strategies.py), and integrates the power over the 5-minute bins.
+#
+# Model
+# - The parallel links between two routers (src_dst_<label>, for all labels)
+#   form a bundle, as in helpers.consumers.LinkSleeping: each strategy sets
+#   the ports of the bundle for its total load, with as many ports as links.
+#   The bundle's ports are ports of its source router.
+# - The rates must carry the load of both directions, so each bundle is
+#   evaluated for the max of its load and of its mirror bundle's (dst, src).
+# - Bundles without any sample in a bin draw no power in that bin; links
+#   without a sample in a bundle that has some carry no load.
+# - Only the port power is simulated; the idle power of the routers is the
+#   same for all strategies and is left out.
+#
+# The matrix is processed in chunks of rows, each evaluated at once with
+# NumPy, so the whole period never needs to fit in memory. Likewise, the
+# energy of each router in each bin is written to a memory-mapped array:
+#   router_energy.npy   [bins x routers x policies] float32 energy [Wh]
+#   router_energy.json  the time grid, the routers and the policies
+# from which the per-bin and cumulative series of a router are read (see
+# `RouterEnergy`).
+
+import json
+
+import numpy as np
+import pandas as pd
+
+import helpers.helpers as helper
+import helpers.power_model as pm
+import helpers.strategies as strategies
+from helpers.interning import LinkTable
+
+def mirror_columns(links):
+    """Column of the mirror link of each link (-1 if absent)."""
+    table = LinkTable()
+    for link_ID in links:
+        table.link(*link_ID.split('_'))
+    return table.mirror()
+
+def link_bundles(links):
+    """Bundles of parallel links, one per (src, dst) host pair.
+    Returns the bundle of each link, and the mirror bundle (-1 if absent),
+    the number of links and the source router of each bundle.
+    """
+    table = LinkTable(with_label=False)
+    bundle = np.array([table.link(*link_ID.split('_')[:2]) for link_ID in links],
+                      dtype=np.int64)
+    sizes = np.bincount(bundle, minlength=len(table))
+    sources = [src for src, dst, label in table.keys]
+    return bundle, table.mirror(), sizes, sources
+
+def _sum_columns(values, groups, num_groups):
+    """Sum of the columns of `values` [rows x columns] in each group."""
+    order = np.argsort(groups, kind='stable')
+    starts = np.searchsorted(groups[order], np.arange(num_groups))
+    return np.add.reduceat(values[:, order], starts, axis=1)
+
+def bundle_loads(load, bundle, mirror):
+    """Load [Gbps] of each bundle, from the `load` of its links
+    [bins x links] (NaN if missing): the sum of the loads of its links,
+    max with the mirror bundle (ignored if it has no sample).
+    Returns the [bins x bundles] loads (0 without sample), and whether each
+    bundle has a sample.
+    """
+    link_present = ~np.isnan(load)
+    present = _sum_columns(link_present.astype(np.int64), bundle, len(mirror)) > 0
+    one_way = _sum_columns(np.where(link_present, load, 0), bundle, len(mirror))
+    one_way[~present] = np.nan
+    has_mirror = mirror >= 0
+    two_ways = one_way.copy()
+    two_ways[:, has_mirror] = np.fmax(one_way[:, has_mirror], one_way[:, mirror[has_mirror]])
+    return np.where(present, two_ways, 0), present
+
+def simulate(load_matrix, policies=None, start=None, end=None,
+             chunk_rows=7*24*12, port_power=None, router_path=None):
+    """Simulate the energy drawn by the ports for each policy.
+    `start` and `end` bound the simulated timestamps (in seconds).
+    Returns
+    - per_bin: one row per 5-min bin, with the number of links with a
+      sample and, for each policy, the energy [Wh] of the bin and the
+      cumulative energy [Wh] since `start`
+    - per_router: the total energy [Wh] of each router, per policy
+    With `router_path`, the energy of each router in each bin is also
+    written there (see `RouterEnergy`).
+    """
+    if policies is None:
+        policies = list(strategies.strategies)
+    if port_power is None:
+        port_power, idle_power = pm.power_model()
+    hours_per_bin = load_matrix.bin_size / 3600
+
+    # Bundles of parallel links, and their router
+    bundle, mirror, sizes, sources = link_bundles(load_matrix.links)
+    routers, router_of_bundle = np.unique(sources, return_inverse=True)
+    # .. the strategies take the number of ports of the bundles as a scalar
+    size_groups = [(size, np.flatnonzero(sizes == size)) for size in np.unique(sizes)]
+
+    # Simulate chunk by chunk
+    rows = load_matrix.rows(start, end)
+    per_bin = []
+    per_router = {policy: np.zeros(len(routers)) for policy in policies}
+    if router_path is not None:
+        router_energy = np.lib.format.open_memmap(
+            router_path.with_suffix('.npy'), mode='w+', dtype=np.float32,
+            shape=(int(rows.stop - rows.start), len(routers), len(policies)))
+    for first in range(rows.start, rows.stop, chunk_rows):
+        chunk = slice(first, min(first + chunk_rows, rows.stop))
+        load = np.asarray(load_matrix.matrix[chunk], dtype=np.float64)
+        load_2ways, present = bundle_loads(load, bundle, mirror)
+
+        bins = pd.DataFrame({
+            'timestamp': load_matrix.timestamps[chunk],
+            'links': (~np.isnan(load)).sum(axis=1),
+        })
+        for k, policy in enumerate(policies):
+            power = np.zeros_like(load_2ways)
+            for size, columns in size_groups:
+                power[:, columns] = strategies.strategies[policy](
+                    load_2ways[:, columns], size, port_power)
+            energy = np.where(present, power, 0) * hours_per_bin
+            bins[policy] = energy.sum(axis=1)
+            router_bins = _sum_columns(energy, router_of_bundle, len(routers))
+            per_router[policy] += router_bins.sum(axis=0)
+            if router_path is not None:
+                router_energy[chunk.start - rows.start:chunk.stop - rows.start, :, k] = router_bins
+        per_bin.append(bins)
+
+    if router_path is not None:
+        router_energy.flush()
+        with open(router_path.with_suffix('.json'), 'w') as f:
+            json.dump({
+                'start_ts': int(load_matrix.timestamps[0] + rows.start*load_matrix.bin_size),
+                'bin_size': load_matrix.bin_size,
+                'routers': routers.tolist(),
+                'policies': policies,
+            }, f)
+
+    # Network-wide per-bin and cumulative energy
+    per_bin = pd.concat(per_bin, ignore_index=True)
+    for policy in policies:
+        per_bin[policy + '_cumulative'] = per_bin[policy].cumsum()
+
+    per_router = pd.DataFrame(per_router, index=pd.Index(routers, name='router'))
+    return per_bin, per_router
+
+class RouterEnergy:
+    """Read-only view of the per-bin energy of each router, as written by
+    `simulate`.
+    - `energy` is the memory-mapped [bins x routers x policies] array [Wh]
+    - `timestamps` are the timestamps of the bins
+    """
+
+    def __init__(self, path=None):
+        if path is None:
+            path = helper.router_energy_path
+        with open(path.with_suffix('.json')) as f:
+            info = json.load(f)
+        self.energy = np.load(path.with_suffix('.npy'), mmap_mode='r')
+        self.routers = {router: i for i, router in enumerate(info['routers'])}
+        self.policies = info['policies']
+        self.timestamps = info['start_ts'] + info['bin_size']*np.arange(len(self.energy))
+
+    def series(self, router):
+        """Energy [Wh] of a router in each bin and cumulated since the first
+        bin, for each policy; one row per bin.
+        """
+        energy = np.asarray(self.energy[:, self.routers[router]], dtype=np.float64)
+        df = pd.DataFrame({'timestamp': self.timestamps})
+        for k, policy in enumerate(self.policies):
+            df[policy] = energy[:, k]
+            df[policy + '_cumulative'] = energy[:, k].cumsum()
+        return df
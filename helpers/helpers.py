@@ -2,7 +2,8 @@
 
 from pathlib import Path
 from datetime import datetime
-import itertools
+import functools
+import numpy as np
 import pandas as pd
 
 import helpers.power_model as pm
@@ -13,8 +14,13 @@ debug = False
 
 # Overall metadata
 dataset_path = Path('europe')
+link_store_path = Path('per-link-data.parquet') # see helpers/link_store.py
+load_matrix_path = Path('load_matrix') # see helpers/load_matrix.py
+router_energy_path = Path('router_energy') # see helpers/energy.py
 seconds_per_day = 24*60*60
 bin_size = 5*60 # 5-minute bins
+# Snapshot parser: 'safe', 'c' or 'stream' (see helpers/snapshot_parser.py)
+snapshot_parser = 'stream'
 
 # Data selection 
 
@@ -32,53 +38,163 @@ end_ts   = ymd_to_timestamp(analysis_end)
 plot_start = '2020-11-01'
 plot_end   = '2020-11-16'
 
+# Rate ladder: the rates (in Gbps) a link can be set to
+rate_ladder = [10, 25, 100]
+# rate_ladder = [10, 25, 50, 100]
+
 # Define the bounds for the link capacity settings
-def capacity_bounds(x):
-    if x <= 10:
-        return 10
-    elif x <= 25:
-        return 25
-    # elif x <= 50:
-    #     return 50
-    else:
-        return 100
+def capacity_bounds(x, rates=None):
+    """Smallest rate of the ladder `rates` (default: `rate_ladder`) that can
+    carry a load `x`; loads above the largest rate get the largest rate.
+    `x` can be a scalar or a NumPy/pandas array of loads (in Gbps).
+    """
+    if rates is None:
+        rates = rate_ladder
+    rates = np.sort(np.asarray(rates))
+    # .. index of the first rate >= x
+    index = np.searchsorted(rates, x, side='left')
+    required = rates[np.minimum(index, len(rates)-1)]
+
+    # .. return the same type as the input
+    if np.ndim(x) == 0:
+        return required.item()
+    if isinstance(x, pd.Series):
+        return pd.Series(required, index=x.index, name=x.name)
+    return required
     
-def all_port_configs(number_of_ports, allow_sleeping=False):
-    """Generate all possible permutation of port rate configs for a
-    given number of ports. 
+def port_config_frontier(number_of_ports, allow_sleeping=False, rates=None,
+                         port_power=None):
+    """Pareto frontier of the port rate configs for a given number of
+    ports: the configs such that no other config offers at least the same
+    capacity for less static power.
+    Ports are interchangeable, so a config is given by the number of ports
+    set at each rate; the cheapest config of each reachable capacity is
+    found with a knapsack over the capacities. Among configs of the same
+    capacity and static power, the one with the most capacity on the higher
+    rates (i.e., the least dynamic power) is kept.
     When `allow_sleeping` is True, a port rate of `0` is allowed.
+    Returns the rates, the number of ports per rate [configs x rates], the
+    capacity and the static power of each config, sorted by power.
     """
 
     # Load the power model
-    port_power, base_power = pm.power_model()
+    if port_power is None:
+        port_power, base_power = pm.power_model()
 
     # Prepare data structures
-    rate_options = ['010', '025', '100']
+    if rates is None:
+        rates = rate_ladder
+    rates = sorted(rates, reverse=True)
     if allow_sleeping:
-        rate_options.insert(0, '000')
-    config_rate = []
-    config_power = []
-
-    # ..Generate all combinaisons
-    for element in itertools.product(rate_options, repeat=number_of_ports):
-        # .. compute the corresponding power
-        power = 0
-        for i in element:
-            power += port_power[int(i)]['static_power']
-
-        config_power.append(power)
-        config_rate.append([int(e) for e in element])
-
-    # .. Push in a dataframe
-    df = pd.DataFrame(config_rate)
-
-    # .. Compute the maximum rate 
-    df['max_capacity'] = df.sum(axis=1)
-    # .. Add the power value
-    df['power'] = config_power
-    # .. drop duplicate configs
-    df.drop_duplicates(subset='max_capacity', keep='last', inplace=True)
-    # .. sort
-    df.sort_values(by='power', inplace=True)
-
-    return df
\ No newline at end of file
+        rates.append(0)
+    rates = np.array(rates)
+    static_power = np.array([port_power[r]['static_power'] for r in rates])
+
+    # .. Capacities in units of the gcd of the rates (e.g., 5G for 10/25/100G)
+    unit = np.gcd.reduce(rates[rates > 0])
+    steps = rates // unit
+    max_steps = number_of_ports*steps.max()
+
+    # .. Knapsack, adding the rates by increasing rate:
+    #    best[k, c] is the least static power of k ports with capacity c, and
+    #    choices[i][k, c] the number of these ports at rate i
+    # -> ties go to more ports at the rate added last, the higher one
+    best = np.full((number_of_ports+1, max_steps+1), np.inf)
+    best[0, 0] = 0
+    choices = [None]*len(rates)
+    for i in reversed(range(len(rates))):
+        new_best = np.full_like(best, np.inf)
+        choice = np.zeros(best.shape, dtype=np.int64)
+        for c in range(number_of_ports+1):
+            shift = c*steps[i]
+            candidate = np.full_like(best, np.inf)
+            candidate[c:, shift:] = (best[:number_of_ports+1-c, :max_steps+1-shift] +
+                                     c*static_power[i])
+            # .. up to rounding errors of the power sums
+            better = candidate < new_best + 1e-9
+            new_best[better] = candidate[better]
+            choice[better] = c
+        best = new_best
+        choices[i] = choice
+
+    # .. Read back the config of each capacity reachable with all the ports
+    capacity_steps = np.flatnonzero(np.isfinite(best[number_of_ports]))
+    counts = np.zeros((len(capacity_steps), len(rates)), dtype=np.int64)
+    ports = np.full(len(capacity_steps), number_of_ports)
+    remaining = capacity_steps.copy()
+    for i in range(len(rates)):
+        counts[:, i] = choices[i][ports, remaining]
+        ports -= counts[:, i]
+        remaining -= counts[:, i]*steps[i]
+
+    # .. Compute the capacity and static power
+    capacity = counts @ rates
+    power = counts @ static_power
+
+    # .. Keep the frontier: sort by power (then by decreasing capacity),
+    #    and keep the configs with more capacity than all cheaper ones
+    order = np.lexsort((-capacity, np.round(power, 9)))
+    best_so_far = np.maximum.accumulate(capacity[order])
+    keep = np.ones(len(order), dtype=bool)
+    keep[1:] = capacity[order][1:] > best_so_far[:-1]
+    order = order[keep]
+
+    return rates, counts[order], capacity[order], power[order]
+
+def all_port_configs(number_of_ports, allow_sleeping=False, rates=None,
+                     port_power=None):
+    """Optimal port rate configs for a given number of ports.
+    When `allow_sleeping` is True, a port rate of `0` is allowed.
+    Returns one row per config of the Pareto frontier (see
+    `port_config_frontier`), sorted by power, with
+    - the rate of each port (columns 0 to number_of_ports-1, by decreasing rate)
+    - the maximum capacity of the config
+    - its static power
+    """
+    if rates is None:
+        rates = rate_ladder
+    if port_power is None:
+        port_power, base_power = pm.power_model()
+    # .. the frontier is memoized (see `optimal_configs`)
+    capacity, power, port_rates = _config_table(
+        number_of_ports, allow_sleeping, tuple(rates), pm.model_key(port_power))
+
+    df = pd.DataFrame(port_rates, columns=range(number_of_ports))
+    df['max_capacity'] = capacity
+    df['power'] = power
+    return df
+
+
+# Lookup of the optimal config for a given capacity
+# -> the frontier is sorted by power *and* by capacity, so the cheapest config
+#    with enough capacity for a load is found with a binary search.
+# -> the tables are cached per (number of ports, sleeping, rates, power model)
+@functools.lru_cache(maxsize=None)
+def _config_table(number_of_ports, allow_sleeping, rates, power_model_key):
+    port_power = {rate: {'static_power': static, 'dynamic_power': dynamic}
+                  for rate, static, dynamic in power_model_key}
+    rates, counts, capacity, power = port_config_frontier(
+        number_of_ports, allow_sleeping, list(rates), port_power)
+    # .. rate of each port, by decreasing rate
+    port_rates = np.array([np.repeat(rates, c) for c in counts])
+    for array in (capacity, power, port_rates):
+        array.setflags(write=False)
+    return capacity, power, port_rates
+
+def optimal_configs(load, number_of_ports, allow_sleeping=False, rates=None,
+                    port_power=None):
+    """Cheapest port config with enough capacity for each `load` (in Gbps).
+    Loads above the maximum capacity get the config with the most capacity.
+    Returns the static power of the configs and the rate of each port
+    [loads x ports], by decreasing rate.
+    """
+    if rates is None:
+        rates = rate_ladder
+    if port_power is None:
+        port_power, base_power = pm.power_model()
+    capacity, power, port_rates = _config_table(
+        number_of_ports, allow_sleeping, tuple(rates), pm.model_key(port_power))
+
+    # .. first config with capacity >= load
+    index = np.minimum(np.searchsorted(capacity, load, side='left'), len(capacity)-1)
+    return power[index], port_rates[index]
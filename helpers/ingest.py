@@ -0,0 +1,557 @@
+# Single-pass ingestion of the OVH snapshots
+#
+# Each 5-minute snapshot is read and parsed once, and the parsed data is
+# handed to a list of consumers (see helpers/consumers.py), each of which
+# produces one of the outputs of the parse_*.py scripts.
+#
+# The snapshots are read from the dataset folder, either as (possibly
+# compressed) snapshot files or from archives (see helpers/archives.py).
+# The folder content is indexed by timestamp (see `SnapshotIndex`), so that
+# runs over a date range only list the snapshots in that range.
+
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import itertools
+import json
+import multiprocessing
+import os
+from pathlib import PurePath
+import queue
+import threading
+
+import numpy as np
+import pandas as pd
+import yaml
+
+import helpers.archives as archives
+import helpers.dataverse as dataverse
+import helpers.helpers as helper
+import helpers.manifest as manifest
+from helpers.snapshot_parser import parsers
+
+def _name_timestamp(name):
+    """Timestamp of a snapshot file name, e.g., europe_yaml_1591000200.yaml
+    Raises ValueError if the name is not the one of a snapshot.
+    """
+    stem, dot, suffix = archives.uncompressed_name(name).rpartition('.')
+    fields = (stem if dot else suffix).split('_')
+    if len(fields) < 3:
+        raise ValueError('not a snapshot: {}'.format(name))
+    return int(fields[2])
+
+def snapshot_timestamp(file):
+    """Extract the timestamp (in seconds) from a snapshot file name."""
+    return _name_timestamp(file.name)
+
+def _is_snapshot_name(name):
+    # .. log files lying around are filtered out
+    if name.endswith('.log') or name.endswith(archives.archive_suffixes):
+        return False
+    try:
+        _name_timestamp(name)
+    except ValueError:
+        return False
+    return True
+
+def is_snapshot(file):
+    """Whether a file (or archive member) is a snapshot."""
+    return _is_snapshot_name(file.name)
+
+def index_path(dataset_path):
+    """Index files of a dataset folder, e.g., europe.index.csv, with the
+    folder state in europe.index.json
+    """
+    return dataset_path.with_name(dataset_path.name + '.index.csv')
+
+class SnapshotIndex:
+    """Index of the snapshot files of a dataset folder, sorted by timestamp.
+    - `timestamps` is the sorted array of the snapshot timestamps
+    - `names` are the matching file names
+    - `archives` are the names of the archives, sorted
+    The folder is scanned once with os.scandir and the index is saved next
+    to it; it is rebuilt when the folder changes (i.e., its mtime), so that
+    listing an unchanged folder of millions of files only reads the index.
+    """
+
+    def __init__(self, dataset_path, rebuild=False):
+        self.dataset_path = dataset_path
+        path = index_path(dataset_path)
+        # .. read before the scan: changes during the scan trigger a rebuild
+        mtime = dataset_path.stat().st_mtime_ns
+        if not rebuild and path.exists() and path.with_suffix('.json').exists():
+            with open(path.with_suffix('.json')) as f:
+                info = json.load(f)
+            if info['mtime'] == mtime:
+                index = pd.read_csv(path, engine='pyarrow',
+                                    dtype={'timestamp': np.int64, 'file': str})
+                self.timestamps = index['timestamp'].to_numpy()
+                self.names = index['file'].to_numpy()
+                self.archives = info['archives']
+                return
+        self._scan()
+        try:
+            self._save(path, mtime)
+        except OSError:
+            # .. e.g., read-only location: the folder is scanned again next time
+            pass
+
+    def _scan(self):
+        timestamps = []
+        names = []
+        self.archives = []
+        with os.scandir(self.dataset_path) as entries:
+            for entry in entries:
+                name = entry.name
+                if name.endswith(archives.archive_suffixes):
+                    self.archives.append(name)
+                elif not name.endswith('.log'):
+                    try:
+                        timestamps.append(_name_timestamp(name))
+                    except ValueError:
+                        continue
+                    names.append(name)
+        order = np.argsort(timestamps, kind='stable')
+        self.timestamps = np.array(timestamps, dtype=np.int64)[order]
+        self.names = np.array(names, dtype=object)[order]
+        self.archives.sort()
+
+    def _save(self, path, mtime):
+        pd.DataFrame({'timestamp': self.timestamps, 'file': self.names}).to_csv(
+            path, index=False, mode='w')
+        # .. written last: an interrupted save is not trusted
+        with open(path.with_suffix('.json'), 'w') as f:
+            json.dump({'mtime': mtime, 'archives': self.archives}, f)
+
+    def select(self, start=None, end=None):
+        """Timestamps and paths of the snapshots with start <= timestamp <= end."""
+        first = 0 if start is None else np.searchsorted(self.timestamps, start, side='left')
+        last = len(self.timestamps) if end is None else np.searchsorted(self.timestamps, end, side='right')
+        return (self.timestamps[first:last].tolist(),
+                [self.dataset_path / name for name in self.names[first:last]])
+
+def list_snapshots(dataset_path, start=None, end=None):
+    """List the snapshot files of the dataset with start <= timestamp <= end
+    (default: all), sorted by timestamp.
+    """
+    timestamps, files = SnapshotIndex(dataset_path).select(start, end)
+    return files
+
+def parse_snapshot(stream, parser=None):
+    """Parse one snapshot from a text stream with the given `parser` (see
+    helpers/snapshot_parser.py).
+    Returns None if the snapshot is not valid YAML.
+    """
+    if parser is None:
+        parser = helper.snapshot_parser
+    try:
+        return parsers[parser](stream)
+    except yaml.YAMLError as exc:
+        print(exc)
+        return None
+
+def load_snapshot(file, parser=None):
+    """Parse one (possibly compressed) snapshot file."""
+    with archives.open_snapshot(file) as stream:
+        return parse_snapshot(stream, parser)
+
+class Consumer:
+    """Base class for the snapshot consumers.
+
+    - `accept(timestamp)` tells whether the consumer needs that snapshot.
+    - `bounds()` gives the first and last timestamps the consumer may
+      accept (None if unbounded), so that only the snapshot files in that
+      range are listed.
+    - `process(timestamp, data)` extracts what the consumer needs from one
+      parsed snapshot. It must only depend on that snapshot.
+    - `process_batch(snapshots)` does the same for a list of
+      (timestamp, data), returning one result per snapshot; consumers can
+      override it to process a whole batch of snapshots at once.
+    - `collect(timestamp, result)` accumulates the output of `process`;
+      it is called in timestamp order.
+    - `finalize()` saves the consumer outputs.
+
+    Consumers supporting incremental runs set `manifest` in
+    `open_manifest(incremental)` (see helpers/manifest.py); in incremental
+    runs, they are only fed the snapshots that are new or changed since
+    their last run.
+    """
+
+    manifest = None
+
+    def accept(self, timestamp):
+        return True
+
+    def bounds(self):
+        return None, None
+
+    def open_manifest(self, incremental):
+        pass
+
+    def process(self, timestamp, data):
+        raise NotImplementedError
+
+    def process_batch(self, snapshots):
+        return [self.process(timestamp, data) for timestamp, data in snapshots]
+
+    def collect(self, timestamp, result):
+        raise NotImplementedError
+
+    def finalize(self):
+        pass
+
+# Consumers used by the worker processes (see `run`)
+_worker_consumers = None
+
+def _init_worker(consumers):
+    global _worker_consumers
+    _worker_consumers = consumers
+
+def _run_consumers(batch):
+    """Run the `process_batch` step of the active consumers on a batch of
+    parsed snapshots, given as (file, timestamp, active, data).
+    Returns (file, timestamp, active, results of the active consumers) for
+    each snapshot, with None results if the snapshot is not valid.
+    """
+    results = [None if data is None else [] for _, _, _, data in batch]
+    # .. each consumer processes all its snapshots of the batch at once
+    for i in sorted(set(itertools.chain.from_iterable(active for _, _, active, _ in batch))):
+        positions = [p for p, (_, _, active, data) in enumerate(batch)
+                     if i in active and data is not None]
+        if not positions:
+            continue
+        consumer_results = _worker_consumers[i].process_batch(
+            [(batch[p][1], batch[p][3]) for p in positions])
+        for p, result in zip(positions, consumer_results):
+            results[p].append(result)
+    return [(file, timestamp, active, result)
+            for (file, timestamp, active, _), result in zip(batch, results)]
+
+def _read_snapshot(file, track):
+    """Parse a snapshot file. With `track`, also return its manifest entry
+    (see helpers/manifest.py), hashed from the bytes read for parsing.
+    """
+    if not track:
+        return load_snapshot(file), None
+    content = file.read_bytes()
+    entry = manifest.file_entry(file, content)
+    return parse_snapshot(archives.decode_snapshot(file, content)), entry
+
+def _process_batch(batch):
+    """Parse a batch of snapshot files and run the active consumers.
+    Returns (file, timestamp, active, results, manifest entry) per snapshot.
+    """
+    parsed, entries = [], []
+    for file, timestamp, active in batch:
+        # .. hash the files only for the consumers tracking them
+        track = any(_worker_consumers[i].manifest is not None for i in active)
+        data, entry = _read_snapshot(file, track)
+        parsed.append((file, timestamp, active, data))
+        entries.append(entry)
+    return [r + (entry,) for r, entry in zip(_run_consumers(parsed), entries)]
+
+def _process_members(batch):
+    """Parse a batch of archive members, given as (member name, timestamp,
+    active, content bytes), and run the active consumers.
+    Archive members are not tracked by the manifests (no manifest entry).
+    """
+    parsed = [(None, timestamp, active,
+               parse_snapshot(archives.decode_snapshot(PurePath(name), content)))
+              for name, timestamp, active, content in batch]
+    return [r + (None,) for r in _run_consumers(parsed)]
+
+def _process_task(task):
+    """Process a batch of snapshot files, or of archive members.
+    Runs in the worker processes when `workers > 1`.
+    """
+    kind, batch = task
+    if kind == 'members':
+        return _process_members(batch)
+    return _process_batch(batch)
+
+def _ordered_map(pool, tasks, window):
+    """Run the tasks in the `pool` and yield the results in submission order,
+    i.e., sorted by timestamp. At most `window` tasks are in flight, which
+    bounds the memory used by results waiting to be collected.
+    """
+    pending = deque()
+    tasks = iter(tasks)
+    for task in itertools.islice(tasks, window):
+        pending.append(pool.submit(_process_task, task))
+    while pending:
+        result = pending.popleft().result()
+        for task in itertools.islice(tasks, 1):
+            pending.append(pool.submit(_process_task, task))
+        yield result
+
+def _interleave(iterables, threads, size):
+    """Iterate over several `iterables` at once, each read by one of
+    `threads` background threads, through a queue of at most `size` items:
+    the threads run ahead of the consumer, but only so far.
+    Items are yielded in arrival order.
+    """
+    items = queue.Queue(size)
+    iterables = iter(iterables)
+    lock = threading.Lock()
+    done = object()
+    errors = []
+    def fill():
+        try:
+            while True:
+                with lock:
+                    iterable = next(iterables, done)
+                if iterable is done:
+                    break
+                for item in iterable:
+                    items.put(item)
+        except Exception as exc:
+            errors.append(exc)
+        finally:
+            items.put(done)
+    for _ in range(threads):
+        threading.Thread(target=fill, daemon=True).start()
+
+    running = threads
+    while running:
+        item = items.get()
+        if item is done:
+            running -= 1
+            continue
+        yield item
+    if errors:
+        raise errors[0]
+
+def _prefetch(iterable, size):
+    """Iterate over `iterable` in a background thread, through a queue of at
+    most `size` items (see `_interleave`).
+    """
+    return _interleave([iterable], 1, size)
+
+def _until_error(iterable, errors):
+    """Iterate over `iterable` until it fails; the exception is appended to
+    `errors` rather than raised.
+    """
+    try:
+        yield from iterable
+    except Exception as exc:
+        errors.append(exc)
+
+def _archive_tasks(consumers, archive, batch_size):
+    """Tasks for the snapshots of an archive that some consumer accepts:
+    the members are read here, in archive order, and sent to the workers in
+    batches of `batch_size`, so that an archive is parsed by all the workers
+    and only a few batches of it are in memory at a time.
+    """
+    batch = []
+    for name, content in archives.iter_members(archive):
+        member = PurePath(name)
+        if not is_snapshot(member):
+            continue
+        timestamp = snapshot_timestamp(member)
+        active = [i for i, c in enumerate(consumers) if c.accept(timestamp)]
+        if not active:
+            continue
+        batch.append((name, timestamp, active, content))
+        if len(batch) == batch_size:
+            yield ('members', batch)
+            batch = []
+    if batch:
+        yield ('members', batch)
+
+def _download_tasks(consumers, downloads, batch_size, queue_size, readers):
+    """Tasks for the files of `downloads`, as they are downloaded: batches of
+    `batch_size` snapshot files, and the batches of members of each archive,
+    with up to `readers` archives read at once.
+    """
+    def sources():
+        batch = []
+        for file in _prefetch(downloads, queue_size):
+            if archives.is_archive(file):
+                yield _archive_tasks(consumers, file, batch_size)
+            elif is_snapshot(file):
+                timestamp = snapshot_timestamp(file)
+                active = [i for i, c in enumerate(consumers) if c.accept(timestamp)]
+                if active:
+                    batch.append((file, timestamp, active))
+                if len(batch) == batch_size:
+                    yield [('files', batch)]
+                    batch = []
+        if batch:
+            yield [('files', batch)]
+    return _interleave(sources(), readers, queue_size)
+
+def process_pool(workers, **kwargs):
+    """Pool of `workers` processes.
+    The workers are forked when possible: the scripts have no __main__ guard.
+    """
+    if 'fork' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('fork')
+    else:
+        context = None
+    return ProcessPoolExecutor(workers, mp_context=context, **kwargs)
+
+def arg_parser(description=None, incremental=False):
+    """Command-line options shared by the parsing scripts; `--incremental`
+    is only offered by the scripts whose outputs support it.
+    """
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('--workers', type=int, default=1,
+                        help='number of processes parsing the snapshots')
+    if incremental:
+        parser.add_argument('--incremental', action='store_true',
+                            help='only process the snapshots that are new or '
+                                 'changed since the last run')
+    parser.add_argument('--batch', type=int, default=1,
+                        help='number of snapshots processed together by '
+                             'the consumers')
+    parser.add_argument('--download', action='store_true',
+                        help='download the dataset (see helpers/download_OVH.py) '
+                             'and parse each file as soon as it is downloaded')
+    parser.add_argument('--download-workers', type=int, default=4,
+                        help='number of files downloaded in parallel')
+    parser.add_argument('--base-url', default=dataverse.base_url,
+                        help='Dataverse server to download from')
+    parser.add_argument('--doi', default=dataverse.DOI,
+                        help='persistent ID of the dataset to download')
+    return parser
+
+def downloads(args, dataset_path=None):
+    """Paths of the dataset files downloaded with the command-line options
+    `args`, as they complete (None without `--download`).
+    """
+    if not args.download:
+        return None
+    if dataset_path is None:
+        dataset_path = helper.dataset_path
+    return (path for file_info, path in dataverse.iter_downloads(
+        dataset_path, base_url=args.base_url, doi=args.doi,
+        workers=args.download_workers))
+
+def _list_tasks(consumers, dataset_path, debug, incremental, batch_size, readers):
+    """Tasks for the snapshots and archives of the `dataset_path`, and their
+    count for the progress log.
+    """
+    # List the snapshots to parse
+    # -> only the snapshot files in the time range of the consumers
+    starts, ends = zip(*(consumer.bounds() for consumer in consumers))
+    start = None if None in starts else min(starts)
+    end = None if None in ends else max(ends)
+    if dataset_path.is_file():
+        timestamps, files = [], []
+        archive_files = [dataset_path]
+    else:
+        index = SnapshotIndex(dataset_path)
+        timestamps, files = index.select(start, end)
+        archive_files = [dataset_path / name for name in index.archives]
+    # .. debugging
+    if debug:
+        timestamps, files = timestamps[:10], files[:10]
+        archive_files = archive_files[:1]
+    # .. the manifests track snapshot files, not archive members
+    if incremental and archive_files:
+        raise ValueError('incremental runs require extracted snapshots')
+    # .. load what has already been processed
+    for consumer in consumers:
+        consumer.open_manifest(incremental)
+    # .. skip the snapshots no consumer is interested in
+    tasks = []
+    for timestamp, file in zip(timestamps, files):
+        active = [i for i, c in enumerate(consumers) if c.accept(timestamp)
+                  and (c.manifest is None or c.manifest.is_new(file))]
+        if active:
+            tasks.append((file, timestamp, active))
+
+    # Progress tracking
+    # -> the number of snapshots in the archives is unknown until read
+    total_files = len(tasks)
+    if archive_files:
+        total_files = '{} files and {} archives'.format(total_files, len(archive_files))
+
+    # Batches of snapshot files, then batches of the members of the archives
+    # -> the archives are only read as the tasks are consumed, up to
+    #    `readers` archives at once, each decompressed by its own thread
+    work = [('files', tasks[i:i+batch_size]) for i in range(0, len(tasks), batch_size)]
+    if archive_files:
+        work = itertools.chain(work, _interleave(
+            (_archive_tasks(consumers, archive, batch_size) for archive in archive_files),
+            min(readers, len(archive_files)), 2*readers))
+    return work, total_files
+
+def run(consumers, dataset_path=None, debug=None, workers=1, incremental=False,
+        batch_size=1, downloads=None, queue_size=8):
+    """Parse each snapshot once and feed it to all the `consumers`.
+    With `workers > 1`, the snapshots are parsed by a pool of processes;
+    the results are collected in timestamp order regardless.
+    With `incremental`, consumers that support it only get the snapshots
+    missing from their manifest and append to their existing outputs.
+    With `batch_size > 1`, the snapshots are handed to the consumers in
+    batches (see `Consumer.process_batch`).
+    Archives in `dataset_path` (or `dataset_path` itself, if it is an
+    archive) are read without extracting them, member by member, up to
+    `workers` archives at once (one thread each), and their snapshots are
+    parsed in batches by the workers like the snapshot files; they are
+    collected after the snapshot files, as the archives are read.
+    With `downloads`, an iterable of file paths yielded as they are downloaded
+    (see the `downloads` function), the files are parsed while the next ones download,
+    through a queue of at most `queue_size` files, rather than listing the
+    `dataset_path`; the results are collected in download order. A failed
+    download is raised once the outputs of the other files are saved.
+    """
+
+    if dataset_path is None:
+        dataset_path = helper.dataset_path
+    if debug is None:
+        debug = helper.debug
+
+    # Parse the files as they are downloaded
+    # -> the manifests track the snapshots of complete datasets
+    # -> a failed download is raised once the other files are parsed and saved
+    download_errors = []
+    if downloads is not None:
+        if incremental:
+            raise ValueError('incremental runs require a downloaded dataset')
+        for consumer in consumers:
+            consumer.open_manifest(False)
+        work = _download_tasks(consumers, _until_error(downloads, download_errors),
+                               batch_size, queue_size, workers)
+        total_files = 'the downloaded files'
+    else:
+        work, total_files = _list_tasks(consumers, dataset_path, debug,
+                                        incremental, batch_size, workers)
+    file_count = 0
+
+    # Start parsing
+    if workers > 1:
+        pool = process_pool(workers, initializer=_init_worker, initargs=(consumers,))
+        # .. fork the workers before the reader (and download) threads start
+        pool.submit(int).result()
+        # .. the tasks (e.g., archive members) are read in a background thread
+        results = _ordered_map(pool, _prefetch(work, queue_size),
+                               window=max(2, 16//batch_size)*workers)
+    else:
+        _init_worker(consumers)
+        pool = None
+        results = map(_process_task, work)
+    results = itertools.chain.from_iterable(results)
+
+    # .. merge the results
+    for file, timestamp, active, result, entry in results:
+        file_count += 1
+        if result is not None:
+            for i, r in zip(active, result):
+                consumers[i].collect(timestamp, r)
+                if consumers[i].manifest is not None and file is not None:
+                    consumers[i].manifest.record(file, timestamp, entry)
+
+        # log progress
+        if file_count%100 == 0:
+            print('#file parsed: {} (out of {})'.format(file_count, total_files))
+
+    if pool is not None:
+        pool.shutdown()
+
+    # Save the outputs
+    for consumer in consumers:
+        consumer.finalize()
+    if download_errors:
+        raise download_errors[0]
@@ -0,0 +1,133 @@
+# Interning of the links of the dataset
+#
+# Links are identified by (src, dst, label). Instead of building (and later
+# splitting) formatted string IDs for every link of every snapshot, each
+# link gets an integer index the first time it is seen, together with the
+# index of its mirror link (dst, src, label). Per-snapshot processing then
+# works on integer arrays, and the mirror lookup is an array index.
+#
+# The max over both directions of a link is a join on a canonical key (the
+# sorted pair of the link and mirror indices), reduced with a sorted groupby;
+# this works for one snapshot or for a whole batch of snapshots at once.
+#
+# The indices are only meaningful within one process: each worker process
+# builds its own table.
+
+import numpy as np
+
+class LinkTable:
+
+    def __init__(self, with_label=True):
+        # .. without label, links are identified by their host pair
+        self.with_label = with_label
+        self.index = {}      # (src, dst, label) -> link index
+        self.keys = []       # link index -> (src, dst, label)
+        self._mirror = []    # link index -> mirror link index (-1 if none)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def link(self, src, dst, label=None):
+        """Index of a link, interned on first use."""
+        if not self.with_label:
+            label = None
+        key = (src, dst, label)
+        index = self.index.get(key)
+        if index is None:
+            index = self.index[key] = len(self.keys)
+            self.keys.append(key)
+            # .. link the two directions together
+            mirror = self.index.get((dst, src, label), -1)
+            self._mirror.append(mirror)
+            if mirror >= 0:
+                self._mirror[mirror] = index
+        return index
+
+    def mirror(self):
+        """Array of the mirror link indices (-1 for one-directional links)."""
+        return np.array(self._mirror, dtype=np.int64)
+
+    def intern_snapshot(self, data):
+        """Flatten a parsed snapshot into integer link indices and loads.
+        Duplicate link IDs appear several times.
+        """
+        link = self.link
+        links = []
+        loads = []
+        for src in data:
+            for entry in data[src]['links']:
+                links.append(link(src, entry['peer'], entry.get('label')))
+                loads.append(entry['load'])
+        return np.array(links, dtype=np.int64), np.array(loads, dtype=np.float64)
+
+    def intern_batch(self, snapshots):
+        """Flatten a list of (timestamp, parsed snapshot) into flat arrays of
+        snapshot positions in the list, integer link indices and loads.
+        Duplicate link IDs appear several times.
+        """
+        link = self.link
+        groups = []
+        links = []
+        loads = []
+        for group, (timestamp, data) in enumerate(snapshots):
+            for src in data:
+                for entry in data[src]['links']:
+                    groups.append(group)
+                    links.append(link(src, entry['peer'], entry.get('label')))
+                    loads.append(entry['load'])
+        return (np.array(groups, dtype=np.int64), np.array(links, dtype=np.int64),
+                np.array(loads, dtype=np.float64))
+
+    def aggregate_batch(self, groups, links, loads):
+        """Sum of the loads of each (snapshot position, link index) present.
+        Returns the snapshot positions, link indices and load sums, sorted.
+        """
+        n = len(self)
+        keys, inverse = np.unique(groups*n + links, return_inverse=True)
+        sums = np.bincount(inverse.ravel(), weights=loads)
+        return keys // n, keys % n, sums
+
+    def aggregate(self, links, loads):
+        """Number of entries and sum of the loads for each link index.
+        Links absent from the snapshot have a count of zero.
+        """
+        n = len(self)
+        counts = np.bincount(links, minlength=n)
+        sums = np.bincount(links, weights=loads, minlength=n)
+        return counts, sums
+
+def pair_keys(mirror):
+    """Canonical key of each link: the lowest index of the link and of its
+    mirror, shared by both directions (one-directional links keep their own).
+    """
+    index = np.arange(len(mirror))
+    return np.where(mirror >= 0, np.minimum(index, mirror), index)
+
+def pair_max(groups, links, values, mirror):
+    """Max of the values of both directions of each link, within each group.
+    The inputs are flat arrays with one entry per (group, link), e.g. all the
+    links present in a day of snapshots with the snapshot index as group.
+    Links whose mirror has no entry in the group keep their own value.
+    Returns the max value of each entry.
+    """
+    if len(links) == 0:
+        return np.asarray(values, dtype=np.float64).copy()
+    # .. (group, sorted pair) key of each entry
+    keys = np.asarray(groups, dtype=np.int64)*len(mirror) + pair_keys(mirror)[links]
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    # .. max over each run of equal keys, broadcast back to the entries
+    starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+    run_max = np.maximum.reduceat(np.asarray(values)[order], starts)
+    result = np.empty(len(links), dtype=run_max.dtype)
+    result[order] = np.repeat(run_max, np.diff(np.r_[starts, len(keys)]))
+    return result
+
+def mirror_max(values, counts, mirror):
+    """Max of the values of each link present in a snapshot (count > 0) and
+    of its mirror link. Links whose mirror is absent keep their own value.
+    Returns the indices of the present links and their max values.
+    """
+    present = np.flatnonzero(counts)
+    return present, pair_max(np.zeros(len(present), dtype=np.int64),
+                             present, values[present], mirror)
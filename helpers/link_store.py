@@ -0,0 +1,139 @@
+# Columnar store for the per-link time series
+#
+# All links are stored in a single Parquet dataset, partitioned by month:
+#   per-link-data.parquet/month=<YYYY-MM>/part-<n>.parquet
+# with one row per (link, timestamp) and columns
+#   link (dictionary-encoded), timestamp [s], load [Gbps], 5-min-bin
+# stored and loaded with the compact dtypes of helpers/schema.py.
+#
+# Loading a date range across all links is a single scan, which only reads
+# the partitions (and row groups) overlapping that range; `load_links` is
+# the query API returning such a selection as a time-indexed frame.
+
+import shutil
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+import helpers.helpers as helper
+import helpers.schema as link_schema
+
+schema = pa.schema([
+    ('link', pa.dictionary(pa.int32(), pa.string())),
+    ('timestamp', pa.uint32()),
+    ('load', pa.float32()),
+    ('5-min-bin', pa.uint16()),
+])
+
+def date_to_timestamp(value):
+    """Convert a date (e.g., '2020-11-01') to a UTC timestamp in seconds."""
+    return int(pd.Timestamp(value).timestamp())
+
+def timestamp_to_month(timestamp):
+    """Partition key(s) of timestamp(s) in seconds, e.g., '2020-11'."""
+    return np.asarray(timestamp, dtype='datetime64[s]').astype('datetime64[M]').astype(str)
+
+class StoreWriter:
+    """Append per-link samples to the store, one file per flush and month."""
+
+    def __init__(self, path=None, flush_rows=1_000_000):
+        if path is None:
+            path = helper.link_store_path
+        self.path = path
+        self.flush_rows = flush_rows
+        self.part = 0
+        self._clear_buffers()
+
+        # .. start from an empty store
+        shutil.rmtree(self.path, ignore_errors=True)
+        self.path.mkdir(parents=True)
+
+    def _clear_buffers(self):
+        self.links = []
+        self.timestamps = []
+        self.loads = []
+
+    def append(self, timestamp, link_loads):
+        """Add the `link_loads` = {link: load} of one snapshot."""
+        self.links.extend(link_loads.keys())
+        self.loads.extend(link_loads.values())
+        self.timestamps.extend([timestamp]*len(link_loads))
+        if len(self.links) >= self.flush_rows:
+            self.flush()
+
+    def flush(self):
+        if not self.links:
+            return
+        timestamps = np.array(self.timestamps, dtype=np.uint32)
+        table = pa.table({
+            'link': pa.array(self.links, pa.string()).dictionary_encode(),
+            'timestamp': timestamps,
+            'load': np.array(self.loads, dtype=np.float32),
+            '5-min-bin': (timestamps % helper.seconds_per_day // helper.bin_size).astype(np.uint16),
+        }, schema=schema)
+        self._clear_buffers()
+
+        # .. one file per month
+        months = timestamp_to_month(timestamps)
+        for month in np.unique(months):
+            partition = self.path / 'month={}'.format(month)
+            partition.mkdir(exist_ok=True)
+            rows = table.filter(pa.array(months == month))
+            pq.write_table(rows, partition / 'part-{:05d}.parquet'.format(self.part))
+        self.part += 1
+
+def _scan(start, end, links, columns, path):
+    """Dataset scanner for the samples of `links` with `start` <= date < `end`."""
+    if path is None:
+        path = helper.link_store_path
+    dataset = ds.dataset(path, format='parquet', partitioning='hive')
+
+    # .. build the predicate, pushed down to the partitions and row groups
+    predicate = None
+    def _and(a, b):
+        return b if a is None else a & b
+    if start is not None:
+        predicate = _and(predicate, ds.field('month') >= str(timestamp_to_month(date_to_timestamp(start))))
+        predicate = _and(predicate, ds.field('timestamp') >= date_to_timestamp(start))
+    if end is not None:
+        predicate = _and(predicate, ds.field('month') <= str(timestamp_to_month(date_to_timestamp(end))))
+        predicate = _and(predicate, ds.field('timestamp') < date_to_timestamp(end))
+    if links is not None:
+        predicate = _and(predicate, ds.field('link').isin(list(links)))
+
+    if columns is None:
+        columns = schema.names
+    return dataset.scanner(columns=columns, filter=predicate)
+
+def read_store(start=None, end=None, links=None, columns=None, path=None):
+    """Load the samples of `links` (default: all) with `start` <= date < `end`.
+    `start` and `end` are dates (e.g., '2020-11-01'), interpreted as UTC.
+    """
+    # .. stores written with wider dtypes are converted on load
+    return link_schema.apply(_scan(start, end, links, columns, path).to_table().to_pandas())
+
+def iter_store(start=None, end=None, links=None, columns=None, path=None):
+    """Same as `read_store`, but yields the samples in batches, so the whole
+    selection never needs to fit in memory.
+    """
+    for batch in _scan(start, end, links, columns, path).to_batches():
+        if batch.num_rows:
+            yield link_schema.apply(batch.to_pandas())
+
+def load_links(links=None, start=None, end=None, columns=None, path=None):
+    """Samples of `links` (default: all) with `start` <= date < `end`, as a
+    single frame indexed by the sample time (DatetimeIndex, UTC) and sorted
+    by time. Only the monthly partitions overlapping the range are read.
+    `columns` selects the columns besides the time and the link (default:
+    all); the link is always kept, so the samples of several links can be
+    told apart.
+    """
+    if columns is not None:
+        columns = ['timestamp', 'link'] + [c for c in columns if c not in ('timestamp', 'link')]
+    data = read_store(start, end, links, columns, path)
+    data.index = pd.DatetimeIndex(pd.to_datetime(data.pop('timestamp'), unit='s'),
+                                  name='timestamp')
+    return data.sort_index(kind='stable')
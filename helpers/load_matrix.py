@@ -0,0 +1,115 @@
+# Dense [timestamps x links] matrix of link loads
+#
+# The load of every link (columns, in the order of link_metadata.csv) at
+# every 5-minute bin (rows) of the analysis period is stored as a float32
+# .npy file, which is memory-mapped rather than loaded:
+#   load_matrix.npy   the matrix, NaN where a link has no sample
+#   load_matrix.json  the time grid and the link index
+#
+# Queries (e.g., all links over a week) are then NumPy slices of the map.
+
+import json
+
+import numpy as np
+
+from helpers.ingest import Consumer
+import helpers.helpers as helper
+from helpers.schema import read_link_metadata
+
+def link_index(meta_file='link_metadata.csv'):
+    """List of link IDs, in column order."""
+    return read_link_metadata(meta_file)['link'].tolist()
+
+class LoadMatrixBuilder(Consumer):
+    """Fill the load matrix from the snapshots.
+    Produces
+    - load_matrix.npy
+    - load_matrix.json
+    """
+
+    def __init__(self, path=None, meta_file='link_metadata.csv',
+                 start_date=helper.analysis_start, end_date=helper.analysis_end):
+        if path is None:
+            path = helper.load_matrix_path
+        self.path = path
+        self.links = link_index(meta_file)
+        self.columns = {link_ID: i for i, link_ID in enumerate(self.links)}
+        # .. time grid
+        self.start_ts = helper.ymd_to_timestamp(start_date)
+        self.num_bins = (helper.ymd_to_timestamp(end_date) - self.start_ts) // helper.bin_size + 1
+        self.matrix = None
+
+    def accept(self, timestamp):
+        return 0 <= (timestamp - self.start_ts) // helper.bin_size < self.num_bins
+
+    def bounds(self):
+        return self.start_ts, self.start_ts + self.num_bins*helper.bin_size - 1
+
+    def process(self, timestamp, data):
+        # columns and loads of the links of the snapshot
+        # -> duplicate link IDs are aggregated by summing their load
+        # -> links missing from the link index are ignored
+        link_loads = {}
+        for src in data:
+            for link in data[src]['links']:
+                column = self.columns.get("{}_{}_{}".format(src,link['peer'],link['label']))
+                if column is not None:
+                    link_loads[column] = link_loads.get(column, 0) + link['load']
+        return (np.fromiter(link_loads.keys(), dtype=np.int64, count=len(link_loads)),
+                np.fromiter(link_loads.values(), dtype=np.float32, count=len(link_loads)))
+
+    def collect(self, timestamp, result):
+        # .. the matrix is only (re)created once there is data to write
+        if self.matrix is None:
+            self.matrix = np.lib.format.open_memmap(
+                self.path.with_suffix('.npy'), mode='w+', dtype=np.float32,
+                shape=(self.num_bins, len(self.links)))
+            self.matrix[:] = np.nan
+        columns, loads = result
+        row = (timestamp - self.start_ts) // helper.bin_size
+        self.matrix[row, columns] = loads
+
+    def finalize(self):
+        if self.matrix is None:
+            return
+        self.matrix.flush()
+        self.matrix = None
+        with open(self.path.with_suffix('.json'), 'w') as f:
+            json.dump({
+                'start_ts': self.start_ts,
+                'bin_size': helper.bin_size,
+                'links': self.links,
+            }, f)
+
+class LoadMatrix:
+    """Read-only view of the load matrix.
+    - `matrix` is the memory-mapped [timestamps x links] array
+    - `timestamps` are the timestamps of the rows
+    - `links` are the link IDs of the columns
+    """
+
+    def __init__(self, path=None):
+        if path is None:
+            path = helper.load_matrix_path
+        with open(path.with_suffix('.json')) as f:
+            info = json.load(f)
+        self.matrix = np.load(path.with_suffix('.npy'), mmap_mode='r')
+        self.links = info['links']
+        self.columns = {link_ID: i for i, link_ID in enumerate(self.links)}
+        self.bin_size = info['bin_size']
+        self.timestamps = info['start_ts'] + self.bin_size*np.arange(len(self.matrix))
+
+    def rows(self, start=None, end=None):
+        """Row slice of the timestamps with `start` <= timestamp < `end`."""
+        first = 0 if start is None else np.searchsorted(self.timestamps, start)
+        last = len(self.timestamps) if end is None else np.searchsorted(self.timestamps, end)
+        return slice(first, last)
+
+    def select(self, start=None, end=None, links=None):
+        """Loads of `links` (default: all) with `start` <= timestamp < `end`,
+        as a (mapped) array.
+        """
+        rows = self.rows(start, end)
+        if links is None:
+            return self.matrix[rows]
+        return self.matrix[rows][:, [self.columns[link_ID] for link_ID in links]]
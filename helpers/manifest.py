@@ -0,0 +1,88 @@
+# Manifest of the snapshots already processed into an output file
+#
+# One row per snapshot, with the file size, modification time and content
+# hash at the time it was processed, and the row of the output file holding
+# its results. This allows to only process new or changed snapshots and to
+# append to an existing output (see helpers.consumers.RowConsumer).
+
+import hashlib
+
+import pandas as pd
+
+def file_hash(file):
+    """Hash of the content of a file."""
+    h = hashlib.blake2b(digest_size=16)
+    with open(file, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+def file_entry(file, content=None):
+    """Size, modification time and hash of a snapshot file, as recorded in
+    the manifest. The hash is computed from `content`, the bytes of the file,
+    if already read (e.g., by the worker parsing it).
+    """
+    stat = file.stat()
+    if content is None:
+        digest = file_hash(file)
+    else:
+        digest = hashlib.blake2b(content, digest_size=16).hexdigest()
+    return {'size': stat.st_size, 'mtime': stat.st_mtime_ns, 'hash': digest}
+
+def manifest_path(output_file):
+    """Manifest file of an output file, e.g., link_sleeping.manifest.csv."""
+    return output_file.with_suffix('.manifest.csv')
+
+class Manifest:
+
+    header = ['file', 'size', 'mtime', 'hash', 'timestamp', 'row']
+
+    def __init__(self, path, load=True):
+        self.path = path
+        # .. {file name: {size, mtime, hash, timestamp, row}}
+        self.entries = {}
+        # .. entries of the snapshots that changed since they were processed
+        self.stale = {}
+        if load and path.exists():
+            df = pd.read_csv(path, dtype={'hash': str})
+            self.entries = df.set_index('file').to_dict(orient='index')
+
+    def is_new(self, file):
+        """Whether a snapshot is new or changed since it was processed."""
+        entry = self.entries.get(file.name)
+        if entry is None:
+            return True
+        stat = file.stat()
+        if entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime_ns:
+            return False
+        # .. size or mtime changed: compare the content
+        if entry['size'] == stat.st_size and entry['hash'] == file_hash(file):
+            entry['mtime'] = stat.st_mtime_ns
+            return False
+        self.stale[file.name] = entry
+        return True
+
+    def stale_rows(self):
+        """Rows of the output holding results of changed snapshots."""
+        return [int(e['row']) for e in self.stale.values() if pd.notna(e['row'])]
+
+    def record(self, file, timestamp, entry=None):
+        """Record that a snapshot has been processed; `entry` is its
+        `file_entry`, computed here if not given.
+        """
+        if entry is None:
+            entry = file_entry(file)
+        self.entries[file.name] = dict(entry, timestamp=timestamp, row=None)
+
+    def save(self, timestamps):
+        """Save the manifest; `timestamps` is the timestamp column of the
+        output file, used to set the row offsets.
+        """
+        row_of = {ts: i for i, ts in enumerate(timestamps)}
+        for entry in self.entries.values():
+            entry['row'] = row_of.get(entry['timestamp'])
+        df = pd.DataFrame.from_dict(self.entries, orient='index')
+        df.index.name = 'file'
+        df = df.reset_index().reindex(columns=self.header)
+        df['row'] = df['row'].astype('Int64')
+        df.to_csv(self.path, index=False, mode='w')
@@ -10,6 +10,7 @@ from plotly.subplots import make_subplots
 
 import helpers.helpers as helper
 import helpers.power_model as pm
+import helpers.strategies as strategies
 
 # ========================================
 # Helpers
@@ -314,9 +315,6 @@ def plot_rate_adaptation_potential(df, PaperPlot=False):
 # ========================================
 def _prep_plot_compare_strategies(max_load, max_links, datapoints):
 
-    # Load the power model
-    port_power, idle_power = pm.power_model()
-
     ##
     # Trafic load (x-axis)
     # .. We do not care about where the traffic goes 
@@ -325,134 +323,22 @@ def _prep_plot_compare_strategies(max_load, max_links, datapoints):
     ## 
     load = np.linspace(0, max_load, datapoints) # in Gbps
 
-    ## 
-    # Baseline: idle power 
     ##
-    idle = idle_power*np.ones(datapoints)
-
-    ## 
-    # Sleeping 
-    # .. that is, minimizing the number of links used
-    # .. - Each link is set at 100G
-    ## 
-    sleeping = []
-    for l in load:
-        req_links = np.ceil(l/100)
-        # assumes linearity of the dynamic power
-        power = (
-            idle_power + 
-            req_links*port_power[100]['static_power'] + 
-            l*port_power[100]['dynamic_power'] 
-        )
-        sleeping.append(power)
-
-    ## 
-    # Naive load balancing 
-    # .. that is, spreading the load but leaving port set at max
-    # .. - Each link is set at 100G
-    # .. - Consider 10 links (to get to the same 1T range)
-    ## 
-    load_balancing = []
-    for l in load:
-        req_links = max_links
-        # assumes linearity of the dynamic power
-        power = (
-            idle_power + 
-            req_links*port_power[100]['static_power'] + 
-            l*port_power[100]['dynamic_power'] 
-        )
-        load_balancing.append(power)
-
-    ## 
-    # Rate adaptation 
-    # .. that is, spreading the load but adjust required rate per link
-    # .. - Each link is set to the same config
-    # .. - Consider 10 links (to get to the same 1T range)
-    ## 
-    rate_adaptation = []
-    for l in load:
-        req_links = max_links
-        # keeps ports at low rate for as long as possible
-        req_rate = helper.capacity_bounds(l/req_links)
-        # assumes linearity of the dynamic power
-        power = (
-            idle_power + 
-            req_links*port_power[req_rate]['static_power'] + 
-            l*port_power[req_rate]['dynamic_power'] 
-        )
-        rate_adaptation.append(power)
-
-
-    ## 
-    # Optimal rate adaptation 
-    # .. that is, spreading the load but adjust required rate per link
-    # .. - Each link is set optimally to best static power
-    # .. - Consider 10 links (to get to the same 1T range)
-    ## 
-
-    df = helper.all_port_configs(max_links)
-    opt_rate_adaptation = []
-    for l in load:
-        # get the optimal static power config
-        static_power = df.loc[df['max_capacity'] >= l].iloc[0]['power']
-        # assumes linearity of the dynamic power
-        dynamic_power = 0
-        l_left = l
-        for link in range(max_links):
-            # .. link rate
-            rate = df.loc[df['max_capacity'] >= l].iloc[0][link]
-            # .. load on that link
-            l_link = min(l_left, rate)
-            # .. corresponding power
-            dynamic_power += l_link*port_power[rate]['dynamic_power']
-            # .. remaining load
-            l_left = l_left - l_link
-            # .. exit 
-            if l_left <= 0:
-                break
-
-        power = (
-            idle_power + 
-            static_power + 
-            dynamic_power
-        )
-        opt_rate_adaptation.append(power)
-
-    ## 
-    # Optimal rate adaptation + Sleeping 
-    # .. that is, spreading the load but adjust required rate per link
-    # .. - Each link is set optimally to best static power
-    # .. - Consider 10 links (to get to the same 1T range)
-    # .. - Allow config that turn links off
-    ## 
-
-    df = helper.all_port_configs(max_links, allow_sleeping=True)
-    opt_rate_adaptation_plus_sleep = []
-    for l in load:
-        # get the optimal static power config
-        static_power = df.loc[df['max_capacity'] >= l].iloc[0]['power']
-        # assumes linearity of the dynamic power
-        dynamic_power = 0
-        l_left = l
-        for link in range(max_links):
-            # .. link rate
-            rate = df.loc[df['max_capacity'] >= l].iloc[0][link]
-            # .. load on that link
-            l_link = min(l_left, rate)
-            # .. corresponding power
-            dynamic_power += l_link*port_power[rate]['dynamic_power']
-            # .. remaining load
-            l_left = l_left - l_link
-            # .. exit 
-            if l_left <= 0:
-                break
-
-        power = (
-            idle_power + 
-            static_power + 
-            dynamic_power
-        )
-        opt_rate_adaptation_plus_sleep.append(power)
+    # Power of each strategy (see helpers/strategies.py)
+    # .. Baseline: idle power
+    # .. Sleeping: minimizing the number of links used, each at 100G
+    # .. No adaptation: spreading the load but leaving port set at max
+    # .. Uni. down-rating: spreading the load, all links at the same rate
+    # .. Opt. down-rating: each link set optimally to best static power
+    # .. Opt. rate adaptation: same, also allowing to turn links off
+    ##
+    power = strategies.evaluate(load, max_links, include_idle=True)
+    idle = power['idle']
+    sleeping = power['sleeping']
+    load_balancing = power['no_adaptation']
+    rate_adaptation = power['uniform_down_rating']
+    opt_rate_adaptation = power['optimal_down_rating']
+    opt_rate_adaptation_plus_sleep = power['optimal_rate_adaptation']
 
     ## 
     # Plot
@@ -463,27 +349,27 @@ def _prep_plot_compare_strategies(max_load, max_links, datapoints):
     # Add traces
     traces.append(go.Scatter(x=load, y=load_balancing,
                         mode='lines',
-                        name='No adaptation',
+                        name=strategies.strategy_names['no_adaptation'],
                         line = dict(color='red'),
                         legendgroup='a'))
     traces.append(go.Scatter(x=load, y=sleeping,
                         mode='lines',
-                        name='Sleeping',
+                        name=strategies.strategy_names['sleeping'],
                         line = dict(color='purple'),
                         legendgroup='b'))
     traces.append(go.Scatter(x=load, y=rate_adaptation,
                         mode='lines',
-                        name='Uni. Down-rating',
+                        name=strategies.strategy_names['uniform_down_rating'],
                         line = dict(color='orange'),
                         legendgroup='c'))
     traces.append(go.Scatter(x=load, y=opt_rate_adaptation,
                         mode='lines',
-                        name='Opt. Down-rating',
+                        name=strategies.strategy_names['optimal_down_rating'],
                         line = dict(color='SeaGreen'),
                         legendgroup='d'))
     traces.append(go.Scatter(x=load, y=opt_rate_adaptation_plus_sleep,
                         mode='lines',
-                        name='Opt. Rate Adaptation',
+                        name=strategies.strategy_names['optimal_rate_adaptation'],
                         line = dict(color='chartreuse'),
                         legendgroup='e'))
     traces.append(go.Scatter(x=load, y=idle,
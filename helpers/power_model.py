@@ -1,5 +1,12 @@
 # Variable and parameter for the power model of the Wedge switch
 
+from pathlib import Path
+import functools
+import json
+
+import numpy as np
+import yaml
+
 def load_exp_data():
     ##
     # Profiling power=f(Gbps)
@@ -39,24 +46,72 @@ def print_exp_data():
         dynamic_power_at_25G,
         dynamic_power_at_10G))
 
-def power_model():
-    idle_power = 108 # W
-    port_power = {
-        100: {
-            'static_power': 1.57,   # W
-            'dynamic_power': 0.011   # W/Gbps
-        },
-        25: {
-            'static_power': 0.52,   # W
-            'dynamic_power': 0.013   # W/Gbps
-        },
-        10: {
-            'static_power': 0.31,   # W
-            'dynamic_power': 0.014   # W/Gbps
-        },
-        0: {
-            'static_power': 0,   # W
-            'dynamic_power': 0   # W/Gbps
-        },
+# ========================================
+# Registry of power models
+# ========================================
+# Models are loaded from YAML or JSON files (see power_models.yaml) and
+# registered by name. Tables derived from a model are memoized, keyed by
+# the model parameters.
+
+models = {}
+default_model = 'wedge'
+# .. built-in models, loaded on first use
+models_file = Path(__file__).parent / 'power_models.yaml'
+
+def register_model(name, port_power, idle_power):
+    """Register a power model.
+    `port_power` = {rate: {'static_power': W, 'dynamic_power': W/Gbps}}
+    """
+    models[name] = {
+        'port_power': {int(rate): {
+            'static_power': float(p['static_power']),
+            'dynamic_power': float(p['dynamic_power'])}
+            for rate, p in port_power.items()},
+        'idle_power': float(idle_power),
     }
-    return port_power, idle_power
+
+def load_models(path):
+    """Register all the power models of a YAML or JSON file."""
+    path = Path(path)
+    with open(path) as f:
+        if path.suffix == '.json':
+            data = json.load(f)
+        else:
+            data = yaml.safe_load(f)
+    for name, model in data.items():
+        register_model(name, model['port_power'], model['idle_power'])
+    return list(data)
+
+def power_model(name=None):
+    """Power model `name` (default: `default_model`).
+    Returns the port power and the idle power.
+    """
+    if default_model not in models:
+        load_models(models_file)
+    if name is None:
+        name = default_model
+    model = models[name]
+    return model['port_power'], model['idle_power']
+
+def model_key(port_power):
+    """Hashable key of the port power parameters, for memoization."""
+    return tuple((rate, p['static_power'], p['dynamic_power'])
+                 for rate, p in sorted(port_power.items()))
+
+@functools.lru_cache(maxsize=None)
+def _rate_arrays(key):
+    # .. rates missing from the model have no power (NaN), rather than 0 W
+    static_power = np.full(max(rate for rate, s, d in key)+1, np.nan)
+    dynamic_power = np.full_like(static_power, np.nan)
+    for rate, s, d in key:
+        static_power[rate] = s
+        dynamic_power[rate] = d
+    static_power.setflags(write=False)
+    dynamic_power.setflags(write=False)
+    return static_power, dynamic_power
+
+def rate_arrays(port_power):
+    """Static [W] and dynamic [W/Gbps] power of the ports, as arrays indexed
+    by rate (memoized); NaN for the rates missing from the model.
+    """
+    return _rate_arrays(model_key(port_power))
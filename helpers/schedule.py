@@ -0,0 +1,218 @@
+# Daily rate schedules
+#
+# For each link and each day, pick a piecewise-constant rate schedule over
+# the 5-minute bins of the day, with at most `max_reconfigurations` rate
+# changes, minimizing the port energy while always providing the capacity
+# required by the load (as given by helper.capacity_bounds).
+#
+# Hysteresis: each reconfiguration costs `switch_cost` [Wh], so the rate
+# only changes when it saves more than that; short dips in the load do not
+# trigger a reconfiguration.
+#
+# The schedule of one day is found by dynamic programming over the segments
+# of the day, all evaluated at once with NumPy. Links are processed in
+# parallel, and the results are cached per link and date range.
+
+from datetime import datetime
+import hashlib
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import helpers.helpers as helper
+import helpers.ingest as ingest
+import helpers.power_model as pm
+from helpers.energy import mirror_columns
+from helpers.load_matrix import LoadMatrix
+
+schedule_header = ['link', 'date', 'reconfigurations', 'energy',
+                   'energy_no_adaptation', 'energy_per_bin_adaptation', 'schedule']
+
+def _rate_power(rates, port_power):
+    """Static and dynamic power of each rate."""
+    static_power = np.array([port_power[r]['static_power'] for r in rates])
+    dynamic_power = np.array([port_power[r]['dynamic_power'] for r in rates])
+    return static_power, dynamic_power
+
+def optimize_day(load, max_reconfigurations, switch_cost=0, rates=None,
+                 port_power=None, hours_per_bin=helper.bin_size/3600):
+    """Optimal rate schedule for the `load` [Gbps] of each bin of one day.
+    As in helpers/energy.py, bins with a missing load (NaN) draw no power;
+    the rate set over them only has to carry the load of the other bins.
+    Returns the schedule, as a list of (first bin, rate), and its energy [Wh]
+    (without the reconfiguration costs).
+    """
+    if rates is None:
+        rates = helper.rate_ladder
+    if port_power is None:
+        port_power, idle_power = pm.power_model()
+    rates = np.sort(rates)
+    static_power, dynamic_power = _rate_power(rates, port_power)
+    load = np.asarray(load, dtype=np.float64)
+    present = ~np.isnan(load)
+    load = np.where(present, load, 0)
+    num_bins = len(load)
+
+    # Cost of each segment [i, j] of the day
+    segment = np.triu(np.ones((num_bins, num_bins), dtype=bool))
+    # .. the rate must carry the max load of the segment
+    segment_max = np.maximum.accumulate(np.where(segment, load[None, :], -np.inf), axis=1)
+    rate_index = np.minimum(np.searchsorted(rates, segment_max, side='left'), len(rates)-1)
+    # .. energy of the segment at that rate, for the bins with a sample
+    cumulative_present = np.concatenate([[0], np.cumsum(present)])
+    length = cumulative_present[None, 1:] - cumulative_present[:-1, None]
+    cumulative_load = np.concatenate([[0], np.cumsum(load)])
+    segment_load = cumulative_load[None, 1:] - cumulative_load[:-1, None]
+    cost = hours_per_bin*(length*static_power[rate_index] +
+                          dynamic_power[rate_index]*segment_load)
+    cost[~segment] = np.inf
+
+    # Dynamic programming over the number of reconfigurations
+    # .. best[j]: min cost of the bins [0, j] with at most s reconfigurations
+    # .. starts[s-1][j]: first bin of the last segment, -1 if the solution
+    #    with s-1 reconfigurations is as good
+    # -> a day of n bins has at most n-1 reconfigurations
+    best = cost[0]
+    starts = []
+    for s in range(min(max_reconfigurations, num_bins - 1)):
+        # .. last segment [i, j], with the bins [0, i-1] solved before
+        candidate = best[:-1, None] + switch_cost + cost[1:, :]
+        start = candidate.argmin(axis=0)
+        new_best = candidate[start, np.arange(num_bins)]
+        improved = new_best < best
+        best = np.where(improved, new_best, best)
+        starts.append(np.where(improved, start + 1, -1))
+
+    # Backtrack from the end of the day
+    segments = []
+    j = num_bins - 1
+    s = len(starts)
+    while True:
+        while s > 0 and starts[s-1][j] == -1:
+            s -= 1
+        i = 0 if s == 0 else starts[s-1][j]
+        segments.append((i, j))
+        if i == 0:
+            break
+        j = i - 1
+        s -= 1
+    segments.reverse()
+
+    # .. merge consecutive segments with the same rate
+    schedule = []
+    energy = 0
+    for i, j in segments:
+        rate = rates[rate_index[i, j]].item()
+        energy += cost[i, j]
+        if not schedule or schedule[-1][1] != rate:
+            schedule.append((int(i), rate))
+    return schedule, energy
+
+def baseline_energy(load, rates=None, port_power=None, hours_per_bin=helper.bin_size/3600):
+    """Energy [Wh] of one day without adaptation (largest rate) and with the
+    lowest rate in each bin (unlimited reconfigurations).
+    Bins with a missing load (NaN) draw no power.
+    """
+    if rates is None:
+        rates = helper.rate_ladder
+    if port_power is None:
+        port_power, idle_power = pm.power_model()
+    rates = np.sort(rates)
+    static_power, dynamic_power = _rate_power(rates, port_power)
+    load = np.asarray(load, dtype=np.float64)
+    load = load[~np.isnan(load)]
+
+    no_adaptation = hours_per_bin*(len(load)*static_power[-1] + dynamic_power[-1]*load.sum())
+    index = np.minimum(np.searchsorted(rates, load, side='left'), len(rates)-1)
+    per_bin = hours_per_bin*(static_power[index] + dynamic_power[index]*load).sum()
+    return no_adaptation, per_bin
+
+# ========================================
+# Schedules of all links
+# ========================================
+
+# Load matrix of the worker processes
+_matrix = None
+
+def _optimize_link(task):
+    """Schedules of one link over all the days of the date range."""
+    global _matrix
+    link_ID, column, mirror, rows, options, cache_file = task
+    if cache_file.exists():
+        return pd.read_csv(cache_file)
+
+    if _matrix is None:
+        _matrix = LoadMatrix(options['load_matrix_path'])
+
+    # .. max of both directions (a missing mirror sample is ignored)
+    load = np.asarray(_matrix.matrix[rows, column], dtype=np.float64)
+    if mirror >= 0:
+        load = np.fmax(load, _matrix.matrix[rows, mirror])
+
+    # .. one schedule per day
+    bins_per_day = helper.seconds_per_day // _matrix.bin_size
+    results = []
+    for first in range(0, len(load) - bins_per_day + 1, bins_per_day):
+        day = load[first:first + bins_per_day]
+        if np.isnan(day).all():
+            continue
+        schedule, energy = optimize_day(
+            day, options['max_reconfigurations'], options['switch_cost'],
+            options['rates'])
+        no_adaptation, per_bin = baseline_energy(day, options['rates'])
+        date = datetime.fromtimestamp(int(_matrix.timestamps[rows][first])).strftime('%Y-%m-%d')
+        results.append([
+            link_ID, date, len(schedule) - 1, energy, no_adaptation, per_bin,
+            ' '.join('{}:{}'.format(i, rate) for i, rate in schedule),
+        ])
+
+    results = pd.DataFrame(results, columns=schedule_header)
+    results.to_csv(cache_file, index=False, mode='w')
+    return results
+
+def optimize_links(start_date, end_date, max_reconfigurations, switch_cost=0,
+                   links=None, rates=None, workers=1, load_matrix_path=None,
+                   cache_path=Path('schedule-cache')):
+    """Daily schedules of `links` (default: all) from `start_date` to `end_date`.
+    The results of each link are cached in `cache_path`, keyed by the link,
+    the date range and the optimization parameters.
+    """
+    if rates is None:
+        rates = helper.rate_ladder
+    if load_matrix_path is None:
+        load_matrix_path = helper.load_matrix_path
+    matrix = LoadMatrix(load_matrix_path)
+    if links is None:
+        links = matrix.links
+    mirror = mirror_columns(matrix.links)
+    rows = matrix.rows(helper.ymd_to_timestamp(start_date), helper.ymd_to_timestamp(end_date))
+    cache_path.mkdir(parents=True, exist_ok=True)
+    # .. rebuilding the load matrix invalidates the cache
+    matrix_version = load_matrix_path.with_suffix('.npy').stat().st_mtime_ns
+
+    # One task per link
+    port_power, idle_power = pm.power_model()
+    options = {
+        'max_reconfigurations': max_reconfigurations,
+        'switch_cost': switch_cost,
+        'rates': list(rates),
+        'load_matrix_path': load_matrix_path,
+    }
+    tasks = []
+    for link_ID in links:
+        column = matrix.columns[link_ID]
+        key = json.dumps([link_ID, start_date, end_date, max_reconfigurations,
+                          switch_cost, sorted(rates), sorted(port_power.items()),
+                          matrix_version])
+        cache_file = cache_path / (hashlib.sha1(key.encode()).hexdigest() + '.csv')
+        tasks.append((link_ID, column, mirror[column], rows, options, cache_file))
+
+    # Optimize the links in parallel
+    if workers > 1:
+        with ingest.process_pool(workers) as pool:
+            results = list(pool.map(_optimize_link, tasks, chunksize=16))
+    else:
+        results = [_optimize_link(task) for task in tasks]
+    return pd.concat(results, ignore_index=True)
@@ -0,0 +1,49 @@
+# Compact dtypes of the link data frames
+#
+# The per-link data holds one row per link and 5-minute bin, so its dtypes
+# drive the memory footprint of the analysis. All link frames, whether read
+# from the store (see helpers/link_store.py) or from the CSV outputs, use
+#   link       categorical (each link ID stored once)
+#   timestamp  uint32 [s]   (epoch seconds, valid until 2106)
+#   load       float32 [Gbps]
+#   5-min-bin  uint16
+#   capacity   uint16 [Gbps]
+#   internal   bool
+
+import numpy as np
+import pandas as pd
+
+dtypes = {
+    'link': 'category',
+    'timestamp': np.uint32,
+    'load': np.float32,
+    '5-min-bin': np.uint16,
+    'capacity': np.uint16,
+    'internal': bool,
+}
+
+def apply(df):
+    """Convert the columns of `df` to their compact dtypes, in place.
+    Columns not in the schema are left as they are; a timestamp column
+    already converted to dates is kept as such.
+    """
+    for column, dtype in dtypes.items():
+        if column not in df.columns:
+            continue
+        if column == 'timestamp' and not pd.api.types.is_integer_dtype(df[column]):
+            continue
+        df[column] = df[column].astype(dtype)
+    # .. sorted link categories: sorting by link is alphabetical, as for strings
+    if 'link' in df.columns:
+        categories = df['link'].cat.categories
+        if not categories.is_monotonic_increasing:
+            df['link'] = df['link'].cat.reorder_categories(categories.sort_values())
+    return df
+
+def read_link_metadata(meta_file='link_metadata.csv'):
+    """Load the link metadata (link, capacity, internal, ...) with compact dtypes."""
+    meta_data = pd.read_csv(meta_file, dtype={'link': str})
+    # .. 'internal' is parsed as object booleans if some values are missing
+    if 'internal' in meta_data.columns:
+        meta_data['internal'] = meta_data['internal'].fillna(False)
+    return apply(meta_data)
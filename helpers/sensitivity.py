@@ -0,0 +1,110 @@
+# Sensitivity of the energy savings to the power model parameters
+#
+# For the strategies whose rate choice does not depend on the power model
+# (no adaptation, sleeping, uniform down-rating), the port energy of a bin
+# only depends on, for each rate, the number of ports set at that rate and
+# the load they carry. These per-bin rate histograms are computed once from
+# the load matrix; a whole grid of power model parameters is then evaluated
+# in one matrix product, with the parameter sets as an extra array axis.
+#
+# As in helpers/energy.py, the parallel links between two routers form a
+# bundle, evaluated for its total load (max of both directions) with as
+# many ports as links.
+
+import itertools
+
+import numpy as np
+import pandas as pd
+
+import helpers.helpers as helper
+import helpers.power_model as pm
+from helpers.energy import bundle_loads, link_bundles
+
+# Strategies supported by the sweep
+sweep_strategies = ['no_adaptation', 'sleeping', 'uniform_down_rating']
+
+def rate_histograms(load_matrix, start=None, end=None, chunk_rows=7*24*12, rates=None):
+    """Per-bin number of ports and load [Gbps] at each rate, per strategy.
+    Returns the timestamps, the rates, and {strategy: (ports, loads)} with
+    arrays of shape [bins x rates].
+    """
+    if rates is None:
+        rates = helper.rate_ladder
+    rates = np.sort(rates)
+    bundle, mirror, sizes, sources = link_bundles(load_matrix.links)
+    top = len(rates) - 1
+
+    rows = load_matrix.rows(start, end)
+    num_bins = rows.stop - rows.start
+    histograms = {strategy: (np.zeros((num_bins, len(rates))), np.zeros((num_bins, len(rates))))
+                  for strategy in sweep_strategies}
+
+    for first in range(rows.start, rows.stop, chunk_rows):
+        chunk = slice(first, min(first + chunk_rows, rows.stop))
+        out = slice(chunk.start - rows.start, chunk.stop - rows.start)
+        load = np.asarray(load_matrix.matrix[chunk], dtype=np.float64)
+        # .. bundles without a sample of their own draw no power, even if
+        #    their mirror bundle has one
+        load, present = bundle_loads(load, bundle, mirror)
+
+        # .. no adaptation: all ports at the top rate
+        ports, loads = histograms['no_adaptation']
+        ports[out, top] = (present*sizes).sum(axis=1)
+        loads[out, top] = load.sum(axis=1)
+
+        # .. sleeping: as many ports at the top rate as required
+        ports, loads = histograms['sleeping']
+        ports[out, top] = np.ceil(load/rates[top]).sum(axis=1)
+        loads[out, top] = load.sum(axis=1)
+
+        # .. uniform down-rating: all ports of a bundle at the lowest rate
+        #    sufficient for its load spread over them
+        ports, loads = histograms['uniform_down_rating']
+        index = np.minimum(np.searchsorted(rates, load/sizes, side='left'), top)
+        for r in range(len(rates)):
+            at_rate = present & (index == r)
+            ports[out, r] = (at_rate*sizes).sum(axis=1)
+            loads[out, r] = np.where(at_rate, load, 0).sum(axis=1)
+
+    return load_matrix.timestamps[rows], rates, histograms
+
+def parameter_grid(port_power, rates, static_scales, dynamic_scales):
+    """Power model parameters for each combination of scaling factors.
+    Returns the grid as a DataFrame, and the static [W] and dynamic [W/Gbps]
+    power of each rate, as arrays of shape [parameter sets x rates].
+    """
+    grid = pd.DataFrame(list(itertools.product(static_scales, dynamic_scales)),
+                        columns=['static_scale', 'dynamic_scale'])
+    static_power, dynamic_power = pm.rate_arrays(port_power)
+    static_power = grid['static_scale'].to_numpy()[:, None] * static_power[rates][None, :]
+    dynamic_power = grid['dynamic_scale'].to_numpy()[:, None] * dynamic_power[rates][None, :]
+    return grid, static_power, dynamic_power
+
+def sweep(rates, histograms, static_scales, dynamic_scales, port_power=None,
+          hours_per_bin=helper.bin_size/3600):
+    """Total port energy [Wh] of each strategy, for each combination of
+    static and dynamic power scaling factors.
+    Returns a tidy table, one row per (strategy, static_scale, dynamic_scale),
+    with the energy and the savings wrt. no adaptation [%].
+    """
+    if port_power is None:
+        port_power, idle_power = pm.power_model()
+    grid, static_power, dynamic_power = parameter_grid(
+        port_power, rates, static_scales, dynamic_scales)
+
+    # Energy of all bins and parameter sets at once: [bins x parameter sets]
+    results = []
+    for strategy, (ports, loads) in histograms.items():
+        energy = hours_per_bin*(ports @ static_power.T + loads @ dynamic_power.T)
+        table = grid.copy()
+        table.insert(0, 'strategy', strategy)
+        table['energy'] = energy.sum(axis=0)
+        results.append(table)
+    results = pd.concat(results, ignore_index=True)
+
+    # Savings wrt. no adaptation, for the same parameters
+    baseline = results.loc[results['strategy'] == 'no_adaptation'].set_index(
+        ['static_scale', 'dynamic_scale'])['energy']
+    reference = baseline.loc[list(zip(results['static_scale'], results['dynamic_scale']))].to_numpy()
+    results['savings_%'] = 100*(1 - results['energy']/reference)
+    return results
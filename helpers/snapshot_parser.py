@@ -0,0 +1,153 @@
+# Parsers for the OVH snapshot files
+#
+# All parsers return the same structure as `yaml.safe_load`, restricted to
+# what the analysis uses:
+#   { src: { 'links': [ {'peer': ..., 'load': ..., 'label': ...}, ... ] } }
+#
+# - 'safe'   : yaml.safe_load, pure-Python loader (the original parser)
+# - 'c'      : same, using the libyaml bindings when available
+# - 'stream' : walks the libyaml event stream and only keeps the link
+#              fields, without composing/constructing the full document;
+#              scalars are resolved and constructed as by safe_load;
+#              aliases to the extracted fields and multi-document files
+#              raise a ComposerError (safe_load resolves the former, and
+#              raises on the latter)
+
+import yaml
+from yaml.composer import ComposerError
+from yaml.constructor import SafeConstructor
+from yaml.events import (AliasEvent, DocumentStartEvent, MappingStartEvent, MappingEndEvent,
+                         SequenceStartEvent, SequenceEndEvent, ScalarEvent)
+from yaml.nodes import ScalarNode
+from yaml.resolver import Resolver
+
+# Use the libyaml bindings when PyYAML was built with them
+Loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+# Fields extracted for each link
+link_fields = ('peer', 'load', 'label')
+
+def parse_safe(stream):
+    return yaml.safe_load(stream)
+
+def parse_c(stream):
+    return yaml.load(stream, Loader=Loader)
+
+def _skip(events, event):
+    """Skip the node starting with `event`."""
+    if not isinstance(event, (MappingStartEvent, SequenceStartEvent)):
+        return
+    depth = 1
+    while depth:
+        event = next(events)
+        if isinstance(event, (MappingStartEvent, SequenceStartEvent)):
+            depth += 1
+        elif isinstance(event, (MappingEndEvent, SequenceEndEvent)):
+            depth -= 1
+
+# Tag resolution and construction of the scalars, as in yaml.safe_load
+_resolver = Resolver()
+_constructor = SafeConstructor()
+
+def _no_alias(event):
+    """Raise on an alias where a value is extracted, rather than dropping it."""
+    if isinstance(event, AliasEvent):
+        raise ComposerError(None, None, "aliases are not supported by the stream parser",
+                            event.start_mark)
+    return event
+
+def _scalar(event):
+    """Value of a scalar event, e.g., 0 for `0`, 8 for `010`, nan for `.nan`,
+    None for `~`, and '0' for `'0'`.
+    """
+    _no_alias(event)
+    tag = event.tag
+    if tag is None or tag == '!':
+        tag = _resolver.resolve(ScalarNode, event.value, event.implicit)
+    node = ScalarNode(tag, event.value, event.start_mark, event.end_mark, event.style)
+    # .. unknown tags raise a ConstructorError, as with safe_load
+    constructor = SafeConstructor.yaml_constructors.get(tag, SafeConstructor.yaml_constructors[None])
+    return constructor(_constructor, node)
+
+def _single_document(documents, event):
+    """Raise on a second document, as safe_load does."""
+    if documents > 1:
+        raise ComposerError("expected a single document in the stream", None,
+                            "but found another document", event.start_mark)
+
+def _parse_links(events):
+    """Parse the sequence of links of one host."""
+    links = []
+    while True:
+        event = _no_alias(next(events))
+        if isinstance(event, SequenceEndEvent):
+            return links
+        if not isinstance(event, MappingStartEvent):
+            _skip(events, event)
+            continue
+        link = {}
+        while True:
+            event = next(events)
+            if isinstance(event, MappingEndEvent):
+                break
+            key = _scalar(event)
+            event = next(events)
+            if key in link_fields:
+                _no_alias(event)
+            if key in link_fields and isinstance(event, ScalarEvent):
+                link[key] = _scalar(event)
+            else:
+                _skip(events, event)
+        links.append(link)
+
+def parse_stream(stream):
+    events = yaml.parse(stream, Loader=Loader)
+
+    # .. find the root mapping (empty documents parse to None)
+    documents = 0
+    for event in events:
+        if isinstance(event, DocumentStartEvent):
+            documents += 1
+            _single_document(documents, event)
+        elif isinstance(event, MappingStartEvent):
+            break
+    else:
+        return None
+
+    # .. one entry per source host
+    data = {}
+    while True:
+        event = next(events)
+        if isinstance(event, MappingEndEvent):
+            break
+        src = _scalar(event)
+        event = _no_alias(next(events))
+        links = []
+        if isinstance(event, MappingStartEvent):
+            while True:
+                event = next(events)
+                if isinstance(event, MappingEndEvent):
+                    break
+                key = _scalar(event)
+                event = next(events)
+                if key == 'links':
+                    _no_alias(event)
+                if key == 'links' and isinstance(event, SequenceStartEvent):
+                    links = _parse_links(events)
+                else:
+                    _skip(events, event)
+        else:
+            _skip(events, event)
+        data[src] = {'links': links}
+
+    # .. drain the remaining events (and raise on trailing syntax errors)
+    for event in events:
+        if isinstance(event, DocumentStartEvent):
+            _single_document(documents + 1, event)
+    return data
+
+parsers = {
+    'safe': parse_safe,
+    'c': parse_c,
+    'stream': parse_stream,
+}
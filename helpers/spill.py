@@ -0,0 +1,56 @@
+# Memory-bounded set of rows
+#
+# Keeps at most `max_size` rows in memory; beyond that, the rows are written
+# to disk as a sorted run and the in-memory set is cleared. Iterating merges
+# the runs and yields the unique rows in sorted order.
+
+import csv
+import heapq
+import tempfile
+from pathlib import Path
+
+class SpillingSet:
+
+    def __init__(self, max_size=1_000_000, tmp_dir=None):
+        self.max_size = max_size
+        self.tmp_dir = tmp_dir
+        self.rows = set()
+        self.runs = []
+
+    def update(self, rows):
+        """Add `rows`, tuples of strings."""
+        self.rows |= rows
+        if len(self.rows) > self.max_size:
+            self.spill()
+
+    def spill(self):
+        """Write the in-memory rows to disk as a sorted run."""
+        if not self.rows:
+            return
+        with tempfile.NamedTemporaryFile('w', newline='', suffix='.csv',
+                                         dir=self.tmp_dir, delete=False) as f:
+            csv.writer(f).writerows(sorted(self.rows))
+            self.runs.append(Path(f.name))
+        self.rows = set()
+
+    def _read_run(self, run):
+        with open(run, newline='') as f:
+            for row in csv.reader(f):
+                yield tuple(row)
+
+    def __iter__(self):
+        """Unique rows, in sorted order."""
+        runs = [self._read_run(run) for run in self.runs]
+        runs.append(iter(sorted(self.rows)))
+        last = None
+        for row in heapq.merge(*runs):
+            if row != last:
+                yield row
+            last = row
+
+    def close(self):
+        """Remove the runs from disk."""
+        for run in self.runs:
+            run.unlink(missing_ok=True)
+        self.runs = []
+        self.rows = set()
@@ -0,0 +1,94 @@
+# Power of the link configuration strategies
+#
+# Each strategy gives the power [W] drawn by the ports connecting two
+# routers, as a function of the load [Gbps] between them and of the number
+# of links available. Loads are arrays of any shape (e.g., a 1D sweep, or a
+# [timestamps x links] matrix, see helpers/load_matrix.py); the power has
+# the same shape. Missing loads (NaN) give a NaN power.
+#
+# All strategies assume linearity of the dynamic power.
+
+import numpy as np
+
+import helpers.helpers as helper
+import helpers.power_model as pm
+
+# Strategies, and their name in the plots
+strategy_names = {
+    'no_adaptation': 'No adaptation',
+    'sleeping': 'Sleeping',
+    'uniform_down_rating': 'Uni. Down-rating',
+    'optimal_down_rating': 'Opt. Down-rating',
+    'optimal_rate_adaptation': 'Opt. Rate Adaptation',
+}
+
+def no_adaptation(load, max_links, port_power):
+    """Spreading the load, but leaving all ports at 100G."""
+    load = np.asarray(load, dtype=float)
+    return (max_links*port_power[100]['static_power'] +
+            load*port_power[100]['dynamic_power'])
+
+def sleeping(load, max_links, port_power):
+    """Minimizing the number of links used; each link is set at 100G."""
+    load = np.asarray(load, dtype=float)
+    req_links = np.ceil(load/100)
+    return (req_links*port_power[100]['static_power'] +
+            load*port_power[100]['dynamic_power'])
+
+def uniform_down_rating(load, max_links, port_power):
+    """Spreading the load, with all links set to the same (lowest) rate."""
+    load = np.asarray(load, dtype=float)
+    # keeps ports at low rate for as long as possible
+    req_rate = helper.capacity_bounds(load/max_links)
+    static_power, dynamic_power = pm.rate_arrays(port_power)
+    return (max_links*static_power[req_rate] +
+            load*dynamic_power[req_rate])
+
+def optimal_down_rating(load, max_links, port_power, allow_sleeping=False):
+    """Spreading the load, with each link set optimally to the best static
+    power. With `allow_sleeping`, links can also be turned off.
+    """
+    load = np.asarray(load, dtype=float)
+    flat_load = load.ravel()
+
+    # get the optimal static power config for all loads at once
+    static_power, port_rates = helper.optimal_configs(
+        flat_load, max_links, allow_sleeping, port_power=port_power)
+
+    # the load fills the ports in order, by decreasing rate
+    load_before = np.cumsum(port_rates, axis=1) - port_rates
+    port_load = np.clip(flat_load[:, None] - load_before, 0, port_rates)
+    dynamic_power = (port_load * pm.rate_arrays(port_power)[1][port_rates]).sum(axis=1)
+
+    return (static_power + dynamic_power).reshape(load.shape)
+
+def optimal_rate_adaptation(load, max_links, port_power):
+    """Optimal down-rating, also allowing to turn links off."""
+    return optimal_down_rating(load, max_links, port_power, allow_sleeping=True)
+
+strategies = {
+    'no_adaptation': no_adaptation,
+    'sleeping': sleeping,
+    'uniform_down_rating': uniform_down_rating,
+    'optimal_down_rating': optimal_down_rating,
+    'optimal_rate_adaptation': optimal_rate_adaptation,
+}
+
+def evaluate(load, max_links, port_power=None, idle_power=None, include_idle=False):
+    """Power of all strategies for the `load` array.
+    Returns {strategy: power array}; with `include_idle`, the idle power of
+    the router is added, and returned as the 'idle' entry.
+    """
+    default_port_power, default_idle_power = pm.power_model()
+    if port_power is None:
+        port_power = default_port_power
+    if idle_power is None:
+        idle_power = default_idle_power
+
+    power = {name: strategy(load, max_links, port_power)
+             for name, strategy in strategies.items()}
+    if include_idle:
+        for name in power:
+            power[name] = power[name] + idle_power
+        power['idle'] = idle_power*np.ones(np.shape(load))
+    return power
@@ -0,0 +1,42 @@
+# Produces
+# - rate_schedules_<start_date>_<end_date>.csv
+#
+# Requires the load matrix (see build_load_matrix.py)
+
+import argparse
+
+import helpers.helpers as helper
+from helpers.schedule import optimize_links
+
+# Setting the date range we use
+start_date = helper.analysis_start
+end_date   = helper.analysis_end
+
+# Command-line options
+parser = argparse.ArgumentParser()
+parser.add_argument('--reconfigurations', type=int, default=2,
+                    help='maximum number of rate changes per link and day')
+parser.add_argument('--switch-cost', type=float, default=0,
+                    help='cost of a rate change [Wh], for hysteresis')
+parser.add_argument('--workers', type=int, default=1,
+                    help='number of processes optimizing the links')
+args = parser.parse_args()
+
+# Optimize the daily schedule of each link
+print("Optimizing the daily rate schedules...")
+schedules = optimize_links(
+    start_date, end_date,
+    max_reconfigurations=args.reconfigurations,
+    switch_cost=args.switch_cost,
+    workers=args.workers)
+
+# Save final data
+file_id = 'rate_schedules'
+file_name = file_id + '_' + start_date + '_' + end_date + '.csv'
+schedules.to_csv(file_name, index=False, mode='w')
+
+# Summary
+print("Energy savings wrt. no adaptation: {:.1f}% (per-bin adaptation: {:.1f}%)".format(
+    100*(1 - schedules['energy'].sum()/schedules['energy_no_adaptation'].sum()),
+    100*(1 - schedules['energy_per_bin_adaptation'].sum()/schedules['energy_no_adaptation'].sum())))
+print("... done.")
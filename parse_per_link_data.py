@@ -2,143 +2,25 @@
 # - link_metadata.csv
 # - link_metadata_withCounts.csv
 # - link_duplicate.csv
-# - per-link-data/<link>.csv
+# - per-link-data.parquet
 
-from pathlib import Path
 import pandas as pd
-import yaml
 
 import helpers.helpers as helper
+import helpers.ingest as ingest
+import helpers.link_store as link_store
+import helpers.schema as schema
+from helpers.consumers import LinkMetadata, PerLinkData
 
-# Load meta parameters
-dataset_path = helper.dataset_path
-seconds_per_day = helper.seconds_per_day
-bin_size = helper.bin_size
-debug = helper.debug
-
-# Progress tracking
-total_files = len(list(dataset_path.rglob('*')))
-file_count = 0
-
-# Data structures
-per_link_data = {}
-header = ['timestamp', 'load', '5-min-bin']
-metadata = []
-metadata_header = ['link', 'capacity', 'internal']
-capacity = int(100) # 100 Gbps for all links
-duplicate_link_IDs = [] # store the links that have duplicated IDs in the dataset
-open('link_metadata.csv', 'w').close() # clear the file
-
+# Command-line options
+args = ingest.arg_parser().parse_args()
 
 # Start parsing
+# -> the per-link data is written to the columnar store as we go
 print("Extracting per-link utilization and metadata...")
-for file in dataset_path.iterdir(): 
-    file_count += 1
-
-    # .. filter out log files lying around
-    if (file.suffix == '.log'): continue
-
-    # .. extract time data
-    timestamp = int(file.stem.split('_')[2])
-    bin = int(timestamp%seconds_per_day/bin_size)
-
-    # read each file
-    with open(file, "r") as stream:
-        try:
-            data = yaml.safe_load(stream)
-        except yaml.YAMLError as exc:
-            print(exc)
-
-    # extract the data for each link
-    for src in data:
-        # The dataset contains duplicate labels for different links
-        # This is most likely a bug from the data collection process
-        # - Creating a unique label for each link does not work, 
-        #   because it makes it impossible to connect links to 
-        #   one another across files.
-        # - Instead, we aggregate duplicate links and sum their load
-        #   - This will be pessimistic wrt potential energy savings by turning
-        #   links off.
-        #   - It may also lead to links with more than 100% util.
-        # - One alternative would be to aggregate using the maximum load.
-        #   - This would "loose" some traffic
-        # Note: we log the number of links with duplicate IDs, 
-        # so we can get an idea of how big of an approximation this entails.
-        ###
-        label = -1
-        for link in data[src]['links']:
-            dst = link['peer']
-            load = link['load']
-            label = link['label']
-            internal = (src[0].islower() and dst[0].islower())
-
-            # build the link ID
-            data_file_name = "{}_{}_{}".format(src,dst,label) 
-
-            # store the metadata
-            # -> duplicate entries will be removed before writing to file
-            metadata.append([
-                data_file_name,
-                capacity,
-                internal
-            ])
-
-            # # store the link data
-            # if data_file_name in per_link_data: 
-            #     last_timestamp = per_link_data[data_file_name][-1][0]
-                
-            #     # if the current and last timestamp match, 
-            #     # we have a case of redundant links
-            #     if last_timestamp == timestamp:
-            #         # Add the load of the current link to what is already logged
-            #         per_link_data[data_file_name][-1][1] += load
-            #         # Save the link ID
-            #         duplicate_link_IDs.append(data_file_name)
-
-            #     else: # append to existing entry
-            #         per_link_data[data_file_name].append([timestamp,load,bin])
-
-            # else: # create a new entry
-            #     per_link_data[data_file_name]=[[timestamp,load,bin]]
-
-    # log progress
-    if file_count%50 == 0:
-        print('#file parsed: {} (out of {})'.format(file_count, total_files))
-        # save wip and clear data structure to limit memory usage
-        tmp = pd.DataFrame(metadata).drop_duplicates()
-        tmp.to_csv('link_metadata.csv', header=False, index=False, mode='a')
-        metadata = []
-
-    # debugging
-    if debug & (file_count == 10):
-        break
-                    
-# Save the per-link data
-print("... saving final metadata")
-
-# .. save the metadata
-# .. create data path if it does not exist already
-tmp = pd.DataFrame(metadata, columns=metadata_header).drop_duplicates().sort_values(by='link')
-tmp.to_csv('link_metadata.csv', index=False, mode='w')
-
-tmp = pd.DataFrame(duplicate_link_IDs).drop_duplicates()
-tmp.to_csv('link_duplicate.csv', index=False, mode='w')
-
-# .. loop through the links
-# print("... saving per-link data")
-# data_path = Path('per-link-data')
-# data_path.mkdir(parents=True, exist_ok=True)
-# for link in per_link_data:
-
-#     # .. load into pandas (allows easy dropping of duplicate entries)
-#     # Note: we should anyway not have any duplicate anymore
-#     tmp = pd.DataFrame(per_link_data[link], columns=header).drop_duplicates().sort_values(by='timestamp')
-
-#     # .. generate file name
-#     file_name = str(data_path / link)+'.csv'
-
-#     # .. save as CSV
-#     tmp.to_csv(file_name, index=False, mode='w')
+ingest.run([LinkMetadata(), PerLinkData()], workers=args.workers,
+           batch_size=args.batch,
+           downloads=ingest.downloads(args))
 print("... done.")
 
 
@@ -147,40 +29,41 @@ print("... done.")
 ###
 print("Add the link utilization counters...")
 meta_file = 'link_metadata.csv'
-meta_data = pd.read_csv(meta_file, names=metadata_header).drop_duplicates().sort_values(by='link')
-
-# .. Create new columns in metadata
-meta_data['below_10_count'] = 0
-meta_data['below_25_count'] = 0
-meta_data['below_50_count'] = 0
-meta_data['above_50_count'] = 0
-meta_data['total_count'] = 0
-
-# .. Loop through all links
-file_count = 0
-total_files = len(meta_data)
-
-for link in meta_data.link:
-    # .. load the link data
-    link_data = pd.read_csv(str(data_path/link)+'.csv')
-    # .. compute the capacity bounds
-    link_data['req_capacity'] = link_data['load'].apply(helper.capacity_bounds)
-    req_capacity = link_data.groupby(by='req_capacity')['5-min-bin'].count()
-    # .. save back into metadata
-    if 10 in req_capacity: meta_data.loc[meta_data['link'] == link, 'below_10_count'] = req_capacity[10]
-    if 25 in req_capacity: meta_data.loc[meta_data['link'] == link, 'below_25_count'] = req_capacity[25]
-    if 50 in req_capacity: meta_data.loc[meta_data['link'] == link, 'below_50_count'] = req_capacity[50]
-    if 100 in req_capacity: meta_data.loc[meta_data['link'] == link, 'above_50_count'] = req_capacity[100] 
-    meta_data.loc[meta_data['link'] == link, 'total_count'] = len(link_data)
-    
-    # log progress
-    file_count += 1
-    if file_count%100 == 0:
-        print('#file parsed: {} (out of {})'.format(file_count, total_files))
-
-    # debugging
-    if debug & (file_count == 10):
-        break
+meta_data = schema.read_link_metadata(meta_file).drop_duplicates().sort_values(by='link')
+
+# .. Count the samples per link and capacity bound, in one scan of the store
+# -> the store is read in batches to bound memory usage
+req_capacity = None
+total_count = None
+for link_data in link_store.iter_store(columns=['link', 'load']):
+    # .. compute the capacity bounds of all samples of the batch at once
+    link_data['req_capacity'] = helper.capacity_bounds(link_data['load'])
+    batch_counts = pd.crosstab(link_data['link'], link_data['req_capacity'])
+    batch_total = link_data['link'].value_counts()
+    if req_capacity is None:
+        req_capacity, total_count = batch_counts, batch_total
+    else:
+        req_capacity = req_capacity.add(batch_counts, fill_value=0)
+        total_count = total_count.add(batch_total, fill_value=0)
+if req_capacity is None:
+    req_capacity, total_count = pd.DataFrame(), pd.Series(dtype=int)
+
+# .. one counter per rate: the published columns of the [10, 25, 50, 100]
+#    ladder (below_10_count, below_25_count, below_50_count, above_50_count),
+#    plus the other rates of `rate_ladder`, if any
+#    -> rates missing from the ladder get zero counts, and the top rate
+#       (above_<rate>_count) counts the samples at the largest rate
+rates = sorted({10, 25, 50, 100} | set(helper.rate_ladder))
+req_capacity = req_capacity.reindex(columns=rates, fill_value=0)
+counts = pd.DataFrame({'below_{}_count'.format(rate): req_capacity[rate]
+                       for rate in rates[:-1]})
+counts['above_{}_count'.format(rates[-2])] = req_capacity[rates[-1]]
+# .. all samples of the link, whatever their load
+counts['total_count'] = total_count
+
+# .. Add the counts to the metadata (links without data get zero counts)
+meta_data = meta_data.join(counts, on='link')
+meta_data[counts.columns] = meta_data[counts.columns].fillna(0).astype(int)
 
 meta_data.to_csv('link_metadata_withCounts.csv', index=False, mode='w')
 print("... done.")
\ No newline at end of file
@@ -0,0 +1,28 @@
+# Produces, in a single pass over the dataset
+# - link_metadata.csv
+# - link_duplicate.csv
+# - link_sleeping.csv
+# - rate_adaptation_<start_date>_<end_date>.csv
+
+import helpers.helpers as helper
+import helpers.ingest as ingest
+from helpers.consumers import LinkMetadata, LinkSleeping, RateAdaptation
+
+# Setting the date range we use
+start_date = helper.analysis_start
+end_date   = helper.analysis_end
+
+# Command-line options
+args = ingest.arg_parser(incremental=True).parse_args()
+
+# Start parsing
+# -> each snapshot is read once and handed to all consumers
+print("Parsing the dataset...")
+ingest.run([
+    LinkMetadata(),
+    LinkSleeping(),
+    RateAdaptation(start_date, end_date),
+], workers=args.workers,
+           incremental=args.incremental, batch_size=args.batch,
+           downloads=ingest.downloads(args))
+print("... done.")
@@ -0,0 +1,36 @@
+# Produces
+# - energy_per_bin_<start_date>_<end_date>.csv
+# - energy_per_router_<start_date>_<end_date>.csv
+# - router_energy.npy / router_energy.json (per-bin energy of each router)
+#
+# Requires the load matrix (see build_load_matrix.py)
+
+import helpers.helpers as helper
+from helpers.energy import simulate
+from helpers.load_matrix import LoadMatrix
+
+# Setting the date range we use
+start_date = helper.analysis_start
+end_date   = helper.analysis_end
+
+# Simulate the energy of each adaptation strategy
+print("Simulating the energy per strategy...")
+per_bin, per_router = simulate(
+    LoadMatrix(),
+    start=helper.ymd_to_timestamp(start_date),
+    end=helper.ymd_to_timestamp(end_date),
+    router_path=helper.router_energy_path)
+
+# Save final data
+file_suffix = '_' + start_date + '_' + end_date + '.csv'
+per_bin.to_csv('energy_per_bin' + file_suffix, index=False, mode='w')
+per_router.to_csv('energy_per_router' + file_suffix, mode='w')
+
+# Summary
+total = per_router.sum()
+print("Total energy [kWh]")
+for policy in total.index:
+    print("- {:25}{:10.1f}  ({:+.1f}%)".format(
+        policy, total[policy]/1000,
+        100*(total[policy]/total['no_adaptation'] - 1)))
+print("... done.")
@@ -0,0 +1,46 @@
+# Produces
+# - power_model_sweep_<start_date>_<end_date>.csv
+#
+# Requires the load matrix (see build_load_matrix.py)
+
+import argparse
+
+import numpy as np
+
+import helpers.helpers as helper
+import helpers.power_model as pm
+from helpers.load_matrix import LoadMatrix
+from helpers.sensitivity import rate_histograms, sweep
+
+# Setting the date range we use
+start_date = helper.analysis_start
+end_date   = helper.analysis_end
+
+# Command-line options
+parser = argparse.ArgumentParser()
+parser.add_argument('--variation', type=float, default=0.5,
+                    help='relative variation of the power parameters (0.5 = +/-50%%)')
+parser.add_argument('--steps', type=int, default=11,
+                    help='number of values per parameter')
+parser.add_argument('--power-model', default=None,
+                    help='name of the power model (see helpers/power_models.yaml)')
+args = parser.parse_args()
+
+# Precompute the per-bin rate histograms (once for all parameters)
+print("Computing the rate histograms...")
+timestamps, rates, histograms = rate_histograms(
+    LoadMatrix(),
+    start=helper.ymd_to_timestamp(start_date),
+    end=helper.ymd_to_timestamp(end_date))
+
+# Evaluate the grid of power model parameters
+print("Sweeping the power model parameters...")
+scales = np.linspace(1 - args.variation, 1 + args.variation, args.steps)
+port_power, idle_power = pm.power_model(args.power_model)
+results = sweep(rates, histograms, scales, scales, port_power)
+
+# Save final data
+file_id = 'power_model_sweep'
+file_name = file_id + '_' + start_date + '_' + end_date + '.csv'
+results.to_csv(file_name, index=False, mode='w')
+print("... done.")